@@ -1,4 +1,28 @@
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import asyncio
+import ipaddress
+import os
+import threading
+import time
+
+from metrics import password_hash_seconds
+
+# ===================== BCRYPT POOL =====================
+# bcrypt releases the GIL, so a small dedicated pool hashes in parallel
+# without eating the request/Mongo threads. Work beyond the pool plus
+# BCRYPT_MAX_QUEUE waiting calls is refused instead of piling up.
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "32"))
+
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_slots = asyncio.Semaphore(BCRYPT_WORKERS + BCRYPT_MAX_QUEUE)
+
+
+class PasswordHashingBusy(Exception):
+    pass
+
 
 # Hash a password
 def hash_password(password: str) -> str:
@@ -9,3 +33,131 @@ def hash_password(password: str) -> str:
 # Verify a password
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+# Hash several passwords at once (seeding)
+def hash_passwords(passwords):
+    return list(_bcrypt_executor.map(hash_password, passwords))
+
+
+async def _run_bcrypt(fn, *args):
+    if _bcrypt_slots.locked():
+        raise PasswordHashingBusy()
+    async with _bcrypt_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_bcrypt_executor, fn, *args)
+
+
+async def hash_password_async(password: str) -> str:
+    started = time.perf_counter()
+    result = await _run_bcrypt(hash_password, password)
+    password_hash_seconds.observe(time.perf_counter() - started, "hash")
+    return result
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    started = time.perf_counter()
+    result = await _run_bcrypt(verify_password, password, hashed)
+    password_hash_seconds.observe(time.perf_counter() - started, "verify")
+    return result
+
+
+# ===================== LOGIN THROTTLE =====================
+# Failed attempts per key (username, client IP) in a sliding window.
+# Checked before any bcrypt work so a credential-stuffing burst costs us
+# a dict lookup, not a hash.
+LOGIN_WINDOW_SECONDS = int(os.getenv("LOGIN_WINDOW_SECONDS", "300"))
+LOGIN_MAX_FAILURES_PER_USER = int(os.getenv("LOGIN_MAX_FAILURES_PER_USER", "5"))
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "20"))
+
+
+class LoginThrottle:
+    def __init__(self, window=LOGIN_WINDOW_SECONDS, max_keys=100_000):
+        self.window = window
+        self.max_keys = max_keys
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        attempts = self._failures.get(key)
+        if not attempts:
+            return 0
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+        if not attempts:
+            del self._failures[key]
+            return 0
+        return len(attempts)
+
+    # Seconds until `key` may try again, or 0
+    def retry_after(self, key, limit):
+        now = time.monotonic()
+        with self._lock:
+            if self._recent(key, now) < limit:
+                return 0
+            return int(self._failures[key][0] + self.window - now) + 1
+
+    def failed(self, key):
+        now = time.monotonic()
+        with self._lock:
+            if key not in self._failures and len(self._failures) >= self.max_keys:
+                # drop the oldest keys rather than grow without bound
+                for stale in list(self._failures)[: self.max_keys // 10]:
+                    del self._failures[stale]
+            self._failures.setdefault(key, deque()).append(now)
+
+    def reset(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+
+
+login_throttle = LoginThrottle()
+
+
+# ===================== CLIENT IP =====================
+# Behind a reverse proxy (Render, nginx) every request's peer is the proxy,
+# so the per-IP limit would lock out all admins at once. FORWARDED_ALLOW_IPS
+# (same variable and syntax as uvicorn's --forwarded-allow-ips) lists the
+# proxies whose X-Forwarded-For is believed: addresses or CIDRs, comma
+# separated, "*" for any peer. On Render, where only the proxy can reach the
+# service, set FORWARDED_ALLOW_IPS=*. If uvicorn already rewrote the client
+# with --proxy-headers, the peer is the real client and is used as is.
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+def _parse_networks(value):
+    networks = []
+    for item in value.split(","):
+        item = item.strip()
+        if item and item != "*":
+            networks.append(ipaddress.ip_network(item, strict=False))
+    return networks
+
+
+TRUST_ALL_PROXIES = "*" in [i.strip() for i in FORWARDED_ALLOW_IPS.split(",")]
+TRUSTED_PROXIES = _parse_networks(FORWARDED_ALLOW_IPS)
+
+
+def _trusted(host):
+    if TRUST_ALL_PROXIES:
+        return True
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+# The client's address, or None when the peer is a trusted proxy that
+# didn't say who it forwards for (callers then skip per-IP limits rather
+# than lump every client together). X-Forwarded-For is read from the right,
+# skipping trusted hops, so a client can't spoof it by sending its own.
+def client_ip(request):
+    peer = request.client.host if request.client else None
+    if not peer or not _trusted(peer):
+        return peer
+    hops = [h.strip() for h in ",".join(request.headers.getlist("x-forwarded-for")).split(",") if h.strip()]
+    for hop in reversed(hops):
+        if not _trusted(hop):
+            return hop
+    return None
@@ -0,0 +1,66 @@
+# benchmarks/compare.py
+#
+#   python benchmarks/compare.py before.json after.json [--threshold 10]
+#
+# Side-by-side of two load.py runs. Exits 1 when any endpoint's p95 or
+# throughput got worse by more than --threshold percent, or it logged more
+# errors than before, so it can gate CI.
+import argparse
+import json
+import sys
+
+# metric -> True when bigger is better
+ENDPOINT_METRICS = {"throughput_rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False,
+                    "peak_rss_mb": False}
+GATED = ("throughput_rps", "p95_ms")
+
+
+def change(before, after, higher_is_better):
+    if not before:
+        return 0.0
+    pct = (after - before) / before * 100
+    return (pct if higher_is_better else -pct) or 0.0
+
+
+def compare(before, after, threshold):
+    regressions = []
+    rows = []
+    for name in sorted(set(before.get("endpoints", {})) & set(after.get("endpoints", {}))):
+        b, a = before["endpoints"][name], after["endpoints"][name]
+        for metric, higher_is_better in ENDPOINT_METRICS.items():
+            pct = change(b[metric], a[metric], higher_is_better)
+            rows.append((name, metric, b[metric], a[metric], pct))
+            if metric in GATED and pct < -threshold:
+                regressions.append(f"{name} {metric}")
+        # a fast run that failed its background writes isn't a win
+        if a.get("logged_errors", 0) > b.get("logged_errors", 0):
+            regressions.append(f"{name} logged_errors")
+
+    for name in sorted(set(before.get("micro", {})) & set(after.get("micro", {}))):
+        b, a = before["micro"][name], after["micro"][name]
+        if isinstance(b, dict):
+            rows.append((f"micro.{name}", "mean_ms", b["mean_ms"], a["mean_ms"],
+                         change(b["mean_ms"], a["mean_ms"], False)))
+
+    print(f"{'endpoint':<28} {'metric':<15} {'before':>10} {'after':>10} {'better %':>9}")
+    for name, metric, b, a, pct in rows:
+        print(f"{name:<28} {metric:<15} {b:>10} {a:>10} {pct:>+9.1f}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+
+    regressions = compare(before, after, args.threshold)
+    if regressions:
+        print(f"\nRegressed by more than {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
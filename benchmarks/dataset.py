@@ -0,0 +1,145 @@
+# benchmarks/dataset.py
+#
+#   MONGO_URL=mongodb://localhost:27017 MONGO_DB=bench_political \
+#       python benchmarks/dataset.py --members 100000 --photos 200
+#
+# Seeds a synthetic, reproducible membership: Tamil names, Tamil Nadu
+# districts, realistic ages/blood groups, and photos drawn from a small
+# pool of generated JPEGs (the photo store is content-addressed, so a
+# pool is what a real dataset with repeated uploads looks like on disk).
+# Only databases named bench_* are ever dropped. With the default
+# MONGO_URL=mongomock:// the data lives in memory, so seed from inside the
+# benchmark process (benchmarks/load.py does) rather than via this CLI.
+from datetime import datetime
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("MONGO_URL", "mongomock://")
+os.environ.setdefault("MONGO_DB", "bench_political")
+os.environ.setdefault("DEDUPE_SECRET", "bench-only")
+if not os.getenv("MEMBER_TOKEN_PRIVATE_KEY"):
+    # throwaway card-signing key; nothing signed here leaves the benchmark
+    from ecdsa import NIST256p, SigningKey
+    os.environ["MEMBER_TOKEN_PRIVATE_KEY"] = SigningKey.generate(curve=NIST256p).to_pem().decode()
+
+from PIL import Image, ImageDraw
+
+from database import DB_NAME, get_client, get_db
+from dedupe import dedupe_keys
+from photostore import save_photo
+from search import name_tokens
+from sequences import format_membership_no
+
+GIVEN_NAMES = [
+    "முருகன்", "செந்தில்", "கார்த்திக்", "அருண்", "விஜய்", "சுரேஷ்", "ரமேஷ்", "பாலாஜி",
+    "கணேசன்", "சரவணன்", "மணிகண்டன்", "இளங்கோ", "தமிழ்செல்வன்", "அன்பரசு", "வேலு",
+    "லதா", "கவிதா", "மீனா", "பிரியா", "சுமதி", "தேவி", "கலைச்செல்வி", "வள்ளி",
+    "அமுதா", "செல்வி", "நிர்மலா", "ராஜேஸ்வரி", "பவானி", "யமுனா", "சங்கீதா",
+]
+FATHER_NAMES = [
+    "கந்தசாமி", "சுப்பிரமணியன்", "ராமசாமி", "பழனிசாமி", "மாரியப்பன்", "சின்னசாமி",
+    "அண்ணாமலை", "கிருஷ்ணன்", "வேலுசாமி", "முத்துசாமி", "ஆறுமுகம்", "பெருமாள்",
+]
+INITIALS = ["மு.", "க.", "சு.", "ரா.", "பெ.", "அ.", "செ.", "வே."]
+DISTRICTS = [
+    "சென்னை", "மதுரை", "கோயம்புத்தூர்", "திருச்சிராப்பள்ளி", "சேலம்", "திருநெல்வேலி",
+    "ஈரோடு", "வேலூர்", "தஞ்சாவூர்", "திண்டுக்கல்", "கன்னியாகுமரி", "விழுப்புரம்",
+    "கடலூர்", "நாமக்கல்", "தூத்துக்குடி", "இராமநாதபுரம்", "சிவகங்கை", "புதுக்கோட்டை",
+]
+BLOOD_GROUPS = ["O+", "B+", "A+", "AB+", "O-", "B-", "A-", "AB-"]
+BLOOD_WEIGHTS = [37, 32, 22, 6, 1, 1, 0.5, 0.5]
+GENDERS = ["Male", "Female", "Other"]
+GENDER_WEIGHTS = [55, 44, 1]
+LOCAL_BODIES = ["Corporation", "Municipality", "Town Panchayat", "Village Panchayat"]
+
+YEAR = datetime.now().year
+
+
+def make_photos(count, seed=7):
+    rng = random.Random(seed)
+    urls = []
+    for i in range(count):
+        im = Image.new("RGB", (600, 800), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(im)
+        for _ in range(12):
+            x, y = rng.randrange(600), rng.randrange(800)
+            draw.ellipse((x, y, x + rng.randrange(40, 200), y + rng.randrange(40, 200)),
+                         fill=tuple(rng.randrange(256) for _ in range(3)))
+        buf = io.BytesIO()
+        im.save(buf, "JPEG", quality=85)
+        urls.append(save_photo(buf.getvalue()))
+    return urls
+
+
+def mobile(i):
+    return f"9{i:09d}"
+
+
+def member(i, rng, photos):
+    given = rng.choice(GIVEN_NAMES)
+    age = max(18, min(90, int(rng.gauss(40, 14))))
+    district = rng.choice(DISTRICTS)
+    name = f"{rng.choice(INITIALS)} {given}"
+    doc = {
+        "membership_no": format_membership_no(YEAR, i + 1),
+        "name": name,
+        "name_tokens": name_tokens(name),
+        "father_name": rng.choice(FATHER_NAMES),
+        "gender": rng.choices(GENDERS, GENDER_WEIGHTS)[0],
+        "dob": f"{YEAR - age}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "age": age,
+        "blood_group": rng.choices(BLOOD_GROUPS, BLOOD_WEIGHTS)[0],
+        "mobile": mobile(i),
+        "email": "",
+        "state": "Tamil Nadu",
+        "district": district,
+        "local_body": rng.choice(LOCAL_BODIES),
+        "nagaram_type": "",
+        "constituency": f"{district} {rng.randint(1, 6)}",
+        "ward": str(rng.randint(1, 60)),
+        "address": f"{rng.randint(1, 300)}, {rng.choice(FATHER_NAMES)} தெரு, {district}",
+        "voter_id": f"TN{i:08d}",
+        "aadhaar": "",
+        "photo": "",
+        "photo_thumb": "",
+    }
+    if photos:
+        doc.update(photos[i % len(photos)])
+    doc["dedupe_keys"] = dedupe_keys(doc)
+    return doc
+
+
+def seed(members, photos=50, batch=5000, rng_seed=42, drop=True):
+    if drop:
+        if not DB_NAME.startswith("bench"):
+            raise SystemExit(f"Refusing to drop {DB_NAME!r}; set MONGO_DB=bench_...")
+        get_client().drop_database(DB_NAME)
+
+    db = get_db()
+    rng = random.Random(rng_seed)
+    photo_urls = make_photos(photos) if photos else []
+    db.districts.insert_many([{"name": d} for d in DISTRICTS])
+
+    started = time.perf_counter()
+    for start in range(0, members, batch):
+        db.candidates.insert_many(
+            [member(i, rng, photo_urls) for i in range(start, min(start + batch, members))],
+            ordered=False,
+        )
+    # registrations made during a benchmark continue after the seed
+    db.counters.update_one({"_id": f"membership_no:{YEAR}"}, {"$max": {"seq": members}}, upsert=True)
+    return {"members": members, "photos": len(photo_urls), "seed_seconds": round(time.perf_counter() - started, 2)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=10000)
+    parser.add_argument("--photos", type=int, default=50)
+    args = parser.parse_args()
+    print(seed(args.members, args.photos))
@@ -0,0 +1,68 @@
+# benchmarks/idcard_render.py
+#
+#   python benchmarks/idcard_render.py [--cards 64] [--layout classic]
+#
+# Per-card render time and PDF size with the static artwork drawn per card
+# (precompiled=False, the old behaviour) vs. stamped from a form XObject.
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.getenv("MEMBER_TOKEN_PRIVATE_KEY"):
+    # throwaway card-signing key; nothing signed here leaves the benchmark
+    from ecdsa import NIST256p, SigningKey
+    os.environ["MEMBER_TOKEN_PRIVATE_KEY"] = SigningKey.generate(curve=NIST256p).to_pem().decode()
+
+from PIL import Image
+
+from idcard import LAYOUTS, render_idcard, render_sheets
+
+
+def sample_cards(n):
+    buf = io.BytesIO()
+    Image.new("RGB", (360, 360), "#7CB342").save(buf, "JPEG", quality=85)
+    photo = buf.getvalue()
+    return [
+        ({"name": f"Member {i}", "mobile": f"98{i:08d}", "district": "சென்னை",
+          "membership_no": f"PBM-2026-{i:06d}"}, photo)
+        for i in range(n)
+    ]
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, out
+
+
+def run(cards, layout, repeat):
+    results = {}
+    for precompiled in (False, True):
+        label = "precompiled" if precompiled else "per_card"
+        single_t, single_pdf = timed(lambda: render_idcard(*cards[0], layout, precompiled), repeat)
+        sheet_t, sheet_pdf = timed(lambda: render_sheets(cards, layout, precompiled), repeat)
+        results[label] = {
+            "single_ms": round(single_t * 1000, 3),
+            "single_bytes": len(single_pdf),
+            "sheet_ms_per_card": round(sheet_t * 1000 / len(cards), 3),
+            "sheet_bytes_per_card": len(sheet_pdf) // len(cards),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=64)
+    parser.add_argument("--layout", default="classic", choices=sorted(LAYOUTS))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(json.dumps(run(sample_cards(args.cards), args.layout, args.repeat), indent=2))
@@ -0,0 +1,236 @@
+# benchmarks/load.py
+#
+#   python benchmarks/load.py --members 10000 --requests 500 --concurrency 32 --out before.json
+#   MONGO_URL=mongodb://localhost:27017 python benchmarks/load.py --members 1000000 ...
+#
+# Seeds a bench_* database (benchmarks/dataset.py), starts the app in
+# process and drives it through httpx's ASGI transport with concurrent
+# clients: no sockets, so the numbers are the app's own cost plus Mongo.
+# Reports throughput, p50/p95/p99 latency and peak RSS per endpoint, and
+# optionally the micro-benchmarks; compare two runs with compare.py.
+#
+# The default in-memory stand-in (mongomock) is fine for CPU-side changes
+# but scales badly with --members; use a real mongod for database work.
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # main.py mounts ./assets
+
+if os.environ.setdefault("MONGO_URL", "mongomock://").startswith("mongomock://"):
+    # mongomock isn't thread-safe; one DB thread, like a single connection
+    os.environ.setdefault("MONGO_MAX_POOL_SIZE", "1")
+
+import dataset  # sets the MONGO_DB default before the app imports
+
+import httpx
+from PIL import Image
+
+import main
+from startup import startup_report
+from verification import member_token
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+# Stats, review-queue and other after-response writes fail into the log,
+# not into the response; count them so a run can't look clean while they do.
+class ErrorCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+logged_errors = ErrorCounter()
+logging.getLogger().addHandler(logged_errors)
+
+
+async def drive(client, make_request, total, concurrency):
+    latencies, errors = [], 0
+    logged_before = logged_errors.count
+    issued = 0
+    peak_rss = rss_mb()
+    done = asyncio.Event()
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while not done.is_set():
+            peak_rss = max(peak_rss, rss_mb())
+            await asyncio.sleep(0.05)
+
+    async def worker():
+        nonlocal issued, errors
+        while issued < total:
+            i = issued
+            issued += 1
+            start = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    sampler = asyncio.create_task(sample_rss())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await sampler
+
+    ms = [s * 1000 for s in latencies]
+    return {
+        "requests": total,
+        "errors": errors,
+        "logged_errors": logged_errors.count - logged_before,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "peak_rss_mb": round(peak_rss, 1),
+    }
+
+
+def small_jpeg(seed):
+    buf = io.BytesIO()
+    Image.new("RGB", (480, 640), (seed % 256, 120, 60)).save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+def scenarios(members, args, headers):
+    rng = random.Random(1)
+    tokens = [member_token({"membership_no": dataset.format_membership_no(dataset.YEAR, i + 1),
+                            "name": ""}) for i in range(min(members, 1000))]
+    card_mobiles = [dataset.mobile(rng.randrange(members)) for _ in range(args.requests)]
+    photo = small_jpeg(7)
+
+    async def register(client, i):
+        data = {"name": "பெ. செல்வி", "age": "34", "blood_group": "B+",
+                "mobile": f"8{i:09d}", "district": "மதுரை"}
+        files = {"photo": ("p.jpg", photo, "image/jpeg")} if args.photo_every and i % args.photo_every == 0 else None
+        return await client.post("/register", data=data, files=files)
+
+    cursors = {}
+
+    async def candidates_page(client, i):
+        district = dataset.DISTRICTS[i % len(dataset.DISTRICTS)]
+        response = await client.get("/admin/candidates", headers=headers,
+                                    params={"district": district, "limit": 100, "after": cursors.get(district, "")})
+        if response.status_code == 200:
+            cursors[district] = response.json()["next"] or ""
+        return response
+
+    async def idcard(client, i):
+        return await client.get(f"/admin/idcard/{card_mobiles[i]}", headers=headers)
+
+    async def verify(client, i):
+        return await client.get(f"/verify/{tokens[i % len(tokens)]}")
+
+    async def districts(client, i):
+        return await client.get("/districts")
+
+    async def stats(client, i):
+        return await client.get("/admin/stats", headers=headers)
+
+    return {
+        "register": register,
+        "get_all_candidates": candidates_page,
+        "generate_idcard_cold": idcard,
+        "generate_idcard_warm": idcard,  # same mobiles again: cache hits
+        "verify": verify,
+        "districts": districts,
+        "admin_stats": stats,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args):
+    seeded = dataset.seed(args.members, args.photos)
+    result = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "mongo": os.environ["MONGO_URL"].split(":", 1)[0],
+            "members": args.members,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "seed": seeded,
+        "endpoints": {},
+    }
+
+    app = main.app
+    async with app.router.lifespan_context(app):
+        while not startup_report.ready:
+            await asyncio.sleep(0.05)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            login = await client.post("/admin/login", data={"username": "admin1", "password": "admin123"})
+            headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+            selected = args.endpoints.split(",") if args.endpoints else None
+            for name, make_request in scenarios(args.members, args, headers).items():
+                if selected and name not in selected:
+                    continue
+                result["endpoints"][name] = await drive(client, make_request, args.requests, args.concurrency)
+                print(f"{name}: {result['endpoints'][name]}", file=sys.stderr)
+
+    if args.micro:
+        import micro
+        result["micro"] = micro.run(args.micro_repeat)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=10000)
+    parser.add_argument("--photos", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500, help="per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--photo-every", type=int, default=4, help="register with a photo every Nth request (0: never)")
+    parser.add_argument("--endpoints", default="", help="comma-separated subset")
+    parser.add_argument("--micro", action="store_true", help="also run benchmarks/micro.py")
+    parser.add_argument("--micro-repeat", type=int, default=20)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    output = json.dumps(asyncio.run(run(args)), indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
@@ -0,0 +1,92 @@
+# benchmarks/micro.py
+#
+#   python benchmarks/micro.py [--repeat 20]
+#
+# Single-process timings of the CPU paths behind the endpoints: ID card
+# rendering, bcrypt, photo normalization and the legacy base64 photo
+# round trip vs. reading from the photo store. Also imported by load.py.
+import argparse
+import base64
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.getenv("MEMBER_TOKEN_PRIVATE_KEY"):
+    # throwaway card-signing key; nothing signed here leaves the benchmark
+    from ecdsa import NIST256p, SigningKey
+    os.environ["MEMBER_TOKEN_PRIVATE_KEY"] = SigningKey.generate(curve=NIST256p).to_pem().decode()
+
+from PIL import Image
+
+
+def timing(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "runs": repeat,
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3),
+        "p95_ms": round(sorted(samples)[max(0, int(len(samples) * 0.95) - 1)] * 1000, 3),
+    }
+
+
+def sample_photo(size=(1200, 1600)):
+    buf = io.BytesIO()
+    Image.effect_noise(size, 48).convert("RGB").save(buf, "JPEG", quality=88)
+    return buf.getvalue()
+
+
+def run(repeat=20):
+    from auth import hash_password, verify_password
+    from idcard import render_idcard, render_sheets
+    from imaging import make_derivatives
+
+    photo = sample_photo()
+    card_photo = make_derivatives(photo)["card"]
+    member = {"name": "மு. முருகன்", "mobile": "9000000001", "district": "மதுரை",
+              "membership_no": "PBM-2026-000001"}
+    results = {}
+
+    results["idcard_render"] = timing(lambda: render_idcard(member, card_photo), repeat)
+    results["idcard_pdf_bytes"] = len(render_idcard(member, card_photo))
+    sheet = [(member, card_photo)] * 8
+    results["idcard_sheet_8"] = timing(lambda: render_sheets(sheet), max(1, repeat // 4))
+
+    hashed = hash_password("admin123")
+    bcrypt_runs = max(3, repeat // 4)
+    results["bcrypt_hash"] = timing(lambda: hash_password("admin123"), bcrypt_runs)
+    results["bcrypt_verify"] = timing(lambda: verify_password("admin123", hashed), bcrypt_runs)
+
+    results["photo_normalize"] = timing(lambda: make_derivatives(photo), max(3, repeat // 4))
+    results["photo_upload_bytes"] = len(photo)
+
+    # what every card render paid before the photo store: a base64 string
+    # in the member document, decoded per request
+    encoded = base64.b64encode(card_photo).decode()
+    results["photo_base64_decode"] = timing(lambda: base64.b64decode(encoded), repeat * 10)
+    results["photo_base64_encode"] = timing(lambda: base64.b64encode(photo), repeat * 10)
+    with tempfile.NamedTemporaryFile(suffix=".jpg") as f:
+        f.write(card_photo)
+        f.flush()
+
+        def read_file():
+            with open(f.name, "rb") as fh:
+                fh.read()
+
+        results["photo_store_read"] = timing(read_file, repeat * 10)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeat), indent=2, ensure_ascii=False))
@@ -0,0 +1,99 @@
+# benchmarks/serialization.py
+#
+#   python benchmarks/serialization.py [--rows 100000] [--repeat 3]
+#
+# Cost of turning a page of list rows (LIST_PROJECTION shape) into response
+# bytes, per --rows rows:
+#   before      str(_id) loop + jsonable_encoder + JSONResponse.render,
+#               what get_all_candidates did until it returned bytes itself
+#   after       serialization.dumps (orjson when installed)
+#   stdlib      serialization.dumps' json fallback
+# plus gzip / br on the encoded body, and BSON decoding as plain dicts vs
+# RawBSONDocument (why the lean path still lets pymongo's C decoder build
+# dicts: raw documents only defer the same work into Python).
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import serialization
+from streaming import brotli, compress
+
+
+def rows(n, seed=1):
+    rng = random.Random(seed)
+    names = ["மு. முருகன்", "க. கவிதா", "சு. செந்தில்", "பெ. செல்வி", "அ. அருண்"]
+    districts = ["சென்னை", "மதுரை", "கோயம்புத்தூர்", "சேலம்"]
+    return [
+        {
+            "_id": ObjectId(),
+            "membership_no": f"PBM-2026-{i + 1:06d}",
+            "name": rng.choice(names),
+            "mobile": f"9{i:09d}",
+            "district": rng.choice(districts),
+            "gender": rng.choice(["Male", "Female"]),
+            "age": rng.randint(18, 90),
+        }
+        for i in range(n)
+    ]
+
+
+def best_of(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"best_ms": round(min(samples) * 1000, 1), "mean_ms": round(statistics.fmean(samples) * 1000, 1)}
+
+
+def run(n=100000, repeat=3):
+    data = rows(n)
+    results = {"rows": n, "orjson": serialization.orjson is not None}
+
+    def before():
+        page = [dict(r) for r in data]
+        for c in page:
+            c["_id"] = str(c["_id"])
+        return JSONResponse(jsonable_encoder({"items": page, "next": None})).body
+
+    def stdlib():
+        return json.dumps({"items": data, "next": None}, default=serialization._default,
+                          ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    results["encode_before"] = best_of(before, repeat)
+    results["encode_after"] = best_of(lambda: serialization.dumps({"items": data, "next": None}), repeat)
+    results["encode_stdlib"] = best_of(stdlib, repeat)
+
+    body = serialization.dumps({"items": data, "next": None})
+    results["body_bytes"] = len(body)
+    results["gzip"] = {**best_of(lambda: compress(body, "gzip"), repeat), "bytes": len(compress(body, "gzip"))}
+    if brotli:
+        results["br"] = {**best_of(lambda: compress(body, "br"), repeat), "bytes": len(compress(body, "br"))}
+
+    raw = b"".join(bson.encode(r) for r in data)
+    results["decode_dicts"] = best_of(lambda: bson.decode_all(raw), repeat)
+    options = bson.CodecOptions(document_class=RawBSONDocument)
+    results["decode_raw_then_dicts"] = best_of(
+        lambda: [dict(d.items()) for d in bson.decode_all(raw, options)], repeat
+    )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.repeat), indent=2))
@@ -0,0 +1,157 @@
+# benchmarks/upload_memory.py
+#
+#   python benchmarks/upload_memory.py [--concurrency 16] [--size-mb 7]
+#
+# Starts the API under uvicorn (MONGO_URL defaults to mongomock://), fires
+# concurrent /register uploads of near-limit photos plus over-limit ones,
+# and reports the server's peak RSS. With streamed uploads the peak should
+# grow by a small constant per request, not by concurrency x upload size.
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the server refuses to start without these
+os.environ.setdefault("DEDUPE_SECRET", "bench-only")
+if not os.getenv("MEMBER_TOKEN_PRIVATE_KEY"):
+    # throwaway card-signing key; nothing signed here leaves the benchmark
+    from ecdsa import NIST256p, SigningKey
+    os.environ["MEMBER_TOKEN_PRIVATE_KEY"] = SigningKey.generate(curve=NIST256p).to_pem().decode()
+
+
+def rss_kb(pid, field):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def make_photo(size):
+    # a real JPEG padded after its EOI marker: decoders ignore the tail
+    buf = io.BytesIO()
+    Image.effect_noise((1600, 1200), 64).convert("RGB").save(buf, "JPEG", quality=90)
+    data = buf.getvalue()
+    return data + os.urandom(max(0, size - len(data)))
+
+
+def form(i):
+    return {"name": f"Upload {i}", "age": "30", "blood_group": "O+",
+            "mobile": f"7{random.randrange(10**9):09d}"}
+
+
+async def rejected(request):
+    # the server answers 413 and stops reading; a client still pushing the
+    # body may only notice the closed connection
+    try:
+        return (await request).status_code
+    except httpx.TransportError as e:
+        return type(e).__name__
+
+
+async def chunked_upload(client, size):
+    # no Content-Length: only the streaming byte count can stop it
+    boundary = "benchboundary"
+    head = (f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="photo"; filename="big.jpg"\r\n'
+            "Content-Type: image/jpeg\r\n\r\n").encode()
+
+    async def body():
+        yield head
+        chunk = b"\xff\xd8\xff" + b"\0" * (1024 * 1024 - 3)
+        for _ in range(size // len(chunk)):
+            yield chunk
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    return await rejected(client.post(
+        "/register", content=body(), timeout=10,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    ))
+
+
+async def load(base_url, concurrency, photo, oversize):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        started = time.perf_counter()
+        ok = await asyncio.gather(*(
+            client.post("/register", data=form(i), files={"photo": ("p.jpg", photo, "image/jpeg")})
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+        big = await asyncio.gather(*(
+            rejected(client.post("/register", data=form(i), timeout=10,
+                                 files={"photo": ("p.jpg", oversize, "image/jpeg")}))
+            for i in range(concurrency)
+        ))
+        chunked = await chunked_upload(client, len(oversize))
+    return {
+        "accepted": sum(r.status_code == 200 for r in ok),
+        "upload_seconds": round(elapsed, 2),
+        "oversize_outcomes": sorted(set(map(str, big))),
+        "chunked_oversize_outcome": chunked,
+    }
+
+
+def main(args):
+    env = {"MONGO_URL": "mongomock://", **os.environ, "PROCESS_WORKERS": str(args.workers)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        for _ in range(300):
+            try:
+                if httpx.get(base_url + "/health/ready").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            time.sleep(0.1)
+
+        baseline = rss_kb(server.pid, "VmRSS")
+        photo = make_photo(args.size_mb * 1024 * 1024)
+        oversize = make_photo(args.oversize_mb * 1024 * 1024)
+        result = asyncio.run(load(base_url, args.concurrency, photo, oversize))
+        peak = rss_kb(server.pid, "VmHWM")
+        workers = [rss_kb(pid, "VmHWM") for pid in children(server.pid)]
+
+        result.update({
+            "concurrency": args.concurrency,
+            "upload_mb": args.size_mb,
+            "in_flight_upload_mb": args.concurrency * args.size_mb,
+            "server_baseline_mb": round(baseline / 1024, 1),
+            "server_peak_mb": round(peak / 1024, 1),
+            "server_growth_mb": round((peak - baseline) / 1024, 1),
+            "worker_peak_mb": [round(kb / 1024, 1) for kb in workers],
+        })
+        print(json.dumps(result, indent=2))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--size-mb", type=int, default=7)
+    parser.add_argument("--oversize-mb", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8765)
+    main(parser.parse_args())
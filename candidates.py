@@ -0,0 +1,259 @@
+# candidates.py
+from bson import ObjectId
+from bson.errors import InvalidId
+from typing import List, Optional
+from typing_extensions import TypedDict
+import csv
+import io
+import itertools
+import json
+import os
+import threading
+import time
+
+from database import db, run_db
+from serialization import dumps
+from streaming import ChunkWriter
+from xlsx import XlsxStreamWriter
+
+candidates_collection = db["candidates"]
+
+# ===================== CONFIG =====================
+LIST_PROJECTION = {"_id": 1, "membership_no": 1, "name": 1, "mobile": 1,
+                   "district": 1, "gender": 1, "age": 1}
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+COUNT_CACHE_SECONDS = int(os.getenv("COUNT_CACHE_SECONDS", "30"))
+SORT_KEYS = ("_id", "membership_no")
+
+
+# Response shapes, for the OpenAPI docs only: list routes return
+# pre-encoded bytes (serialization.json_response), nothing re-validates.
+MemberRow = TypedDict("MemberRow", {
+    "_id": str, "membership_no": str, "name": str, "mobile": str,
+    "district": str, "gender": str, "age": int,
+}, total=False)
+
+
+class MemberPage(TypedDict, total=False):
+    items: List[MemberRow]
+    next: Optional[str]
+    total: int
+
+# Member fields as captured by register, in form order:
+# (field, type, required, default)
+MEMBER_SCHEMA = (
+    ("name", str, True, None),
+    ("father_name", str, False, ""),
+    ("gender", str, False, ""),
+    ("dob", str, False, ""),
+    ("age", int, True, None),
+    ("blood_group", str, True, None),
+    ("mobile", str, True, None),
+    ("email", str, False, ""),
+    ("state", str, False, "Tamil Nadu"),
+    ("district", str, False, ""),
+    ("local_body", str, False, ""),
+    ("nagaram_type", str, False, ""),
+    ("constituency", str, False, ""),
+    ("ward", str, False, ""),
+    ("address", str, False, ""),
+    ("voter_id", str, False, ""),
+    ("aadhaar", str, False, ""),
+)
+EXPORT_COLUMNS = ("membership_no",) + tuple(field for field, *_ in MEMBER_SCHEMA)
+# exported only when asked for by name (columns=...,aadhaar)
+SENSITIVE_COLUMNS = ("aadhaar",)
+DEFAULT_EXPORT_COLUMNS = tuple(c for c in EXPORT_COLUMNS if c not in SENSITIVE_COLUMNS)
+EXPORT_FORMATS = ("csv", "xlsx")
+
+
+def _as_text(value):
+    # spreadsheets hand numbers back as floats (9876543210.0)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return "" if value is None else str(value).strip()
+
+
+# Stored form of a mobile number: bare 10 digits when it looks like an
+# Indian number (+91 98..., 098..., "98765 43210"), otherwise just trimmed.
+def normalize_mobile(value):
+    mobile = _as_text(value)
+    digits = "".join(ch for ch in mobile if ch not in " -()")
+    if digits.startswith("+"):
+        digits = digits[1:]
+    if not digits.isdigit():
+        return mobile
+    if len(digits) == 12 and digits.startswith("91"):
+        return digits[2:]
+    if len(digits) == 11 and digits.startswith("0"):
+        return digits[1:]
+    return digits
+
+
+# Same rules register's Form(...) parameters enforce; returns (doc, error)
+def validate_member(row):
+    doc = {}
+    for field, kind, required, default in MEMBER_SCHEMA:
+        value = _as_text(row.get(field))
+        if not value:
+            if required:
+                return None, f"{field} is required"
+            doc[field] = default
+            continue
+        if kind is int:
+            try:
+                value = int(float(value))
+            except ValueError:
+                return None, f"{field} must be a number"
+        doc[field] = value
+    doc["mobile"] = normalize_mobile(doc["mobile"])
+    return doc, None
+
+
+# ===================== FILTERS =====================
+
+def build_query(district="", gender="", constituency="", min_age=None, max_age=None):
+    query = {}
+    if district:
+        query["district"] = district
+    if gender:
+        query["gender"] = gender
+    if constituency:
+        query["constituency"] = constituency
+    if min_age is not None or max_age is not None:
+        query["age"] = {}
+        if min_age is not None:
+            query["age"]["$gte"] = min_age
+        if max_age is not None:
+            query["age"]["$lte"] = max_age
+    return query
+
+
+# Keyset pagination: the cursor is the last row's sort value, so page N
+# costs the same as page 1 (no skip()).
+def apply_cursor(query, sort, after):
+    if not after:
+        return query
+    if sort == "_id":
+        try:
+            after = ObjectId(after)
+        except InvalidId:
+            raise ValueError("Invalid cursor")
+    return {**query, sort: {"$gt": after}}
+
+
+def next_cursor(rows, sort, limit):
+    if len(rows) < limit or not rows:
+        return None
+    return str(rows[-1].get(sort))
+
+
+# ===================== COUNTS =====================
+# Exact counts over filtered sets are cached briefly; the unfiltered total
+# comes from collection metadata and costs nothing.
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+def count_candidates(query):
+    if not query:
+        return candidates_collection.estimated_document_count()
+
+    key = json.dumps(query, sort_keys=True, default=str)
+    now = time.monotonic()
+    with _count_lock:
+        hit = _count_cache.get(key)
+        if hit and hit[1] > now:
+            return hit[0]
+
+    total = candidates_collection.count_documents(query)
+    with _count_lock:
+        if len(_count_cache) > 1024:
+            _count_cache.clear()
+        _count_cache[key] = (total, now + COUNT_CACHE_SECONDS)
+    return total
+
+
+# ===================== FETCH =====================
+
+# _id stays an ObjectId; serialization.dumps writes it as a string
+def find_page(query, sort, limit):
+    return list(
+        candidates_collection.find(query, LIST_PROJECTION)
+        .sort(sort, 1)
+        .limit(limit)
+    )
+
+
+async def _iter_batches(query, projection, sort, limit=None):
+    cursor = candidates_collection.find(query, projection).sort(sort, 1).batch_size(STREAM_BATCH_SIZE)
+    if limit:
+        cursor = cursor.limit(limit)
+    try:
+        while True:
+            batch = await run_db(lambda: list(itertools.islice(cursor, STREAM_BATCH_SIZE)))
+            if not batch:
+                break
+            yield batch
+    finally:
+        await run_db(cursor.close)
+
+
+async def stream_ndjson(query, sort, limit=None):
+    async for batch in _iter_batches(query, LIST_PROJECTION, sort, limit):
+        yield b"".join(dumps(c) + b"\n" for c in batch)
+
+
+# ===================== EXPORT =====================
+# Rows go out one cursor batch at a time; memory stays flat no matter how
+# many members match.
+
+def parse_columns(columns):
+    if not columns:
+        return list(DEFAULT_EXPORT_COLUMNS)
+    selected = [c.strip() for c in columns.split(",") if c.strip()]
+    unknown = [c for c in selected if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return selected
+
+
+# Text a spreadsheet would run as a formula (=HYPERLINK(...), +cmd, @SUM)
+# gets a leading ' so it shows as text. Form fields are public input.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def stream_csv(query, columns):
+    projection = {c: 1 for c in columns} | {"_id": 0}
+    yield "\ufeff".encode("utf-8")  # BOM so Excel reads Tamil text as UTF-8
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    async for batch in _iter_batches(query, projection, "_id"):
+        writer.writerows([_csv_cell(c.get(col, "")) for col in columns] for c in batch)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+async def stream_xlsx(query, columns):
+    projection = {c: 1 for c in columns} | {"_id": 0}
+    out = ChunkWriter()
+    book = XlsxStreamWriter(out, "Members")
+    book.write_rows([columns])
+    async for batch in _iter_batches(query, projection, "_id"):
+        book.write_rows([c.get(col, "") for col in columns] for c in batch)
+        yield out.drain()
+    book.close()
+    yield out.drain()
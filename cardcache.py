@@ -0,0 +1,199 @@
+# cardcache.py
+from collections import OrderedDict
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from verification import qr_data
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Bump whenever the card artwork/layout changes so cached PDFs are rebuilt.
+TEMPLATE_VERSION = "4"
+
+IDCARD_LAYOUT = os.getenv("IDCARD_LAYOUT", "classic")
+
+# Everything the card depends on. photo_base64 only exists on documents
+# that predate the photo store.
+CARD_FIELDS = ("name", "mobile", "district", "membership_no", "photo", "photo_base64")
+CARD_PROJECTION = {field: 1 for field in CARD_FIELDS}
+
+IDCARD_CACHE_MAX_BYTES = int(os.getenv("IDCARD_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+IDCARD_CACHE_DIR = os.getenv("IDCARD_CACHE_DIR", os.path.join(BASE_DIR, "cache", "idcards"))
+IDCARD_DISK_CACHE_MAX_BYTES = int(os.getenv("IDCARD_DISK_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+# pruning goes down to this share of the cap, so it runs once per many puts
+DISK_PRUNE_TO = 0.9
+# The directory is measured (and pruned if over the cap) after a worker
+# has written this share of the cap since its last look, or that look is
+# older than DISK_SCAN_SECONDS. Other workers' writes are only seen by
+# measuring, so with N workers it overshoots by at most N x the share.
+DISK_SCAN_SHARE = 0.02
+DISK_SCAN_SECONDS = 300
+
+
+# Kept here rather than in idcard.py so the request path can compute keys
+# (and answer 304s / cache hits) without importing ReportLab.
+def card_key(cnd, layout=None):
+    h = hashlib.sha256(f"{TEMPLATE_VERSION}:{layout or IDCARD_LAYOUT}".encode())
+    for field in CARD_FIELDS:
+        h.update(b"\x00" + str(cnd.get(field) or "").encode("utf-8"))
+    # the QR token's expiry moves with the calendar, not with the member
+    h.update(b"\x00" + qr_data(cnd).encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+# ===================== TWO-TIER CACHE =====================
+# Keys are hashes of the card's inputs (card_key above), so an edited
+# member simply produces a new key and the stale PDF is never served again;
+# it ages out of the LRU and the disk tier can be wiped at any time.
+# The disk tier is LRU by mtime (hits touch the file) under its own byte
+# cap; it is measured lazily from put (see DISK_SCAN_SHARE), never at import.
+
+class CardCache:
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._disk_bytes = 0        # as of the last scan
+        self._disk_written = 0      # by this process since then
+        self._disk_scanned_at = None
+        self._prune_lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_files(self):
+        # -> [(mtime, path, size)]
+        out = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith(".pdf"):
+                    continue  # another worker's half-written temp file
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                out.append((st.st_mtime, path, st.st_size))
+        return out
+
+    def _scan_due(self):
+        # caller holds the lock
+        if self._disk_scanned_at is None:
+            return True
+        return (self._disk_written >= self.disk_max_bytes * DISK_SCAN_SHARE
+                or time.monotonic() - self._disk_scanned_at >= DISK_SCAN_SECONDS)
+
+    # Measures the whole directory (every worker's files) and drops the
+    # least recently used PDFs while it is over the cap.
+    def _sweep_disk(self):
+        if not self._prune_lock.acquire(blocking=False):
+            return  # another thread is already at it
+        try:
+            files = self._disk_files()
+            total = sum(size for _, _, size in files)
+            if total > self.disk_max_bytes:
+                target = self.disk_max_bytes * DISK_PRUNE_TO
+                for _, path, size in sorted(files):
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+            with self._lock:
+                self._disk_bytes = total
+                self._disk_written = 0
+                self._disk_scanned_at = time.monotonic()
+        finally:
+            self._prune_lock.release()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".pdf")
+
+    def _remember(self, key, data):
+        # caller holds the lock
+        if len(data) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return data
+
+        if self.disk_dir:
+            try:
+                path = self._disk_path(key)
+                with open(path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = None
+            if data is not None:
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    pass  # pruned meanwhile
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, data)
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        with self._lock:
+            self._remember(key, data)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            if self.disk_max_bytes:
+                with self._lock:
+                    self._disk_written += len(data)
+                    due = self._scan_due()
+                if due:
+                    self._sweep_disk()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_bytes": self._disk_bytes + self._disk_written,
+                "disk_max_bytes": self.disk_max_bytes,
+            }
+
+
+idcard_cache = CardCache(IDCARD_CACHE_MAX_BYTES, IDCARD_CACHE_DIR, IDCARD_DISK_CACHE_MAX_BYTES)
@@ -1,16 +1,23 @@
 from database import db
-from auth import hash_password
+from auth import hash_passwords
+
+DEFAULT_ADMINS = [
+    {"username": "superadmin", "password": "super123", "role": "superadmin"},
+    {"username": "admin1", "password": "admin123", "role": "admin"},
+    {"username": "admin2", "password": "admin123", "role": "admin"},
+    {"username": "admin3", "password": "admin123", "role": "admin"},
+    {"username": "admin4", "password": "admin123", "role": "admin"},
+]
 
 def create_default_admins():
-    if db.admins.count_documents({}) > 0:
+    # stops at the first document; no bcrypt work at all once seeded
+    if db.admins.find_one({}, {"_id": 1}):
         return
 
+    hashed = hash_passwords([a["password"] for a in DEFAULT_ADMINS])
     admins = [
-        {"username": "superadmin", "password": hash_password("super123"), "role": "superadmin", "active": True},
-        {"username": "admin1", "password": hash_password("admin123"), "role": "admin", "active": True},
-        {"username": "admin2", "password": hash_password("admin123"), "role": "admin", "active": True},
-        {"username": "admin3", "password": hash_password("admin123"), "role": "admin", "active": True},
-        {"username": "admin4", "password": hash_password("admin123"), "role": "admin", "active": True}
+        {**a, "password": h, "active": True}
+        for a, h in zip(DEFAULT_ADMINS, hashed)
     ]
 
     db.admins.insert_many(admins)
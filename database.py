@@ -1,17 +1,139 @@
 # database.py
 from pymongo import MongoClient
+from pymongo.database import Database
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
 import os
+import threading
 import urllib.parse
 
+from metrics import mongo_listener
+
 # ===================== MONGODB CONFIG =====================
 
 USERNAME = "pasumaibharatam_db_user"
 PASSWORD = urllib.parse.quote_plus("pasumai123")
 CLUSTER = "pasumai.mrsonfr.mongodb.net"
 
-MONGO_URL = f"mongodb+srv://{USERNAME}:{PASSWORD}@{CLUSTER}/?retryWrites=true&w=majority"
+MONGO_URL = os.getenv(
+    "MONGO_URL",
+    f"mongodb+srv://{USERNAME}:{PASSWORD}@{CLUSTER}/?retryWrites=true&w=majority",
+)
+DB_NAME = os.getenv("MONGO_DB", "political_db")
+
+# Pool / timeouts. The executor below is sized to the pool so a thread
+# never sits waiting for a free connection.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "32"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "4"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
 
 # ===================== CONNECTION =====================
 
-client = MongoClient(MONGO_URL)
-db = client["political_db"]
+def _mongomock_client():
+    import inspect
+    import mongomock
+    from mongomock.collection import BulkOperationBuilder
+
+    # pymongo 4.10+ passes sort= from UpdateOne / ReplaceOne into the bulk
+    # builder, which mongomock (4.3, requirements-dev.txt) doesn't take
+    for name in ("add_update", "add_replace"):
+        method = getattr(BulkOperationBuilder, name)
+        if "sort" not in inspect.signature(method).parameters:
+            def without_sort(self, *args, _method=method, sort=None, **kwargs):
+                return _method(self, *args, **kwargs)
+            setattr(BulkOperationBuilder, name, without_sort)
+    return mongomock.MongoClient()
+
+
+def _make_client():
+    # MONGO_URL=mongomock:// gives an in-memory stand-in for local runs/tests
+    if MONGO_URL.startswith("mongomock://"):
+        return _mongomock_client()
+
+    return MongoClient(
+        MONGO_URL,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        event_listeners=[mongo_listener],
+    )
+
+
+# Nothing connects at import: building the client (SRV lookup included)
+# happens on first use, normally from the startup task via connect().
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _make_client()
+    return _client
+
+
+def get_db():
+    return get_client()[DB_NAME]
+
+
+def connect():
+    get_client().admin.command("ping")
+
+
+class _LazyCollection:
+    def __init__(self, name):
+        self._name = name
+        self._collection = None
+
+    def _get(self):
+        if self._collection is None:
+            self._collection = get_db()[self._name]
+        return self._collection
+
+    def __getattr__(self, attr):
+        return getattr(self._get(), attr)
+
+    def __getitem__(self, key):
+        return self._get()[key]
+
+
+class _LazyDatabase:
+    # db["x"] / db.x hand out collection proxies without touching the
+    # network; real Database methods (command, ...) resolve the client.
+    def __init__(self):
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = _LazyCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if hasattr(Database, name):
+            return getattr(get_db(), name)
+        return self[name]
+
+
+db = _LazyDatabase()
+
+# ===================== ASYNC ACCESS =====================
+# pymongo is blocking; async routes hand every call to this bounded pool
+# instead of running it on the event loop.
+
+_executor = ThreadPoolExecutor(max_workers=MONGO_MAX_POOL_SIZE, thread_name_prefix="mongo")
+
+
+async def run_db(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,279 @@
+# dedupe.py
+#
+#   python dedupe.py        # cluster the whole collection into dedupe_reviews
+#
+# Blocking keys for duplicate members, stored on each candidate as
+# dedupe_keys (multikey index):
+#   v:<voter id>                  strong - same person, reject
+#   a:<hmac of aadhaar>           strong - the number itself is never stored here
+#   p:<name>|<father>|<dob>       phonetic - probably the same person, review
+# A registration only looks at members sharing one of its keys, so the
+# check is one indexed $in lookup regardless of collection size.
+from datetime import datetime
+import hashlib
+import hmac
+import logging
+import os
+import pymongo
+import re
+import sys
+
+from database import db
+from search import name_tokens
+
+logger = logging.getLogger(__name__)
+
+candidates_collection = db["candidates"]
+reviews_collection = db["dedupe_reviews"]
+
+# ===================== CONFIG =====================
+# HMAC key for aadhaar numbers. Dedicated and required: changing it
+# orphans every stored a: key (re-run migration 0005).
+DEDUPE_SECRET = os.getenv("DEDUPE_SECRET", "").encode()
+# members sharing a key beyond this are not matched inline (e.g. a
+# placeholder voter ID typed by a whole booth); the batch job reports them
+DEDUPE_MAX_MATCHES = int(os.getenv("DEDUPE_MAX_MATCHES", "20"))
+# the batch job groups the whole collection; well past the client's
+# request-sized socket timeout
+DEDUPE_CLUSTER_TIMEOUT_SECONDS = int(os.getenv("DEDUPE_CLUSTER_TIMEOUT_SECONDS", "1800"))
+STRONG_KEYS = ("v:", "a:")
+MATCH_PROJECTION = {"_id": 1, "membership_no": 1, "dedupe_keys": 1}
+
+
+# ===================== PHONETIC KEY =====================
+# Consonant skeleton shared by Tamil and Latin spellings of a name, so
+# "முருகன்" and "Murugan" agree: vowels are dropped, letters
+# Tamil doesn't distinguish (k/g, t/d, p/b, s/ch/j) or people mix up
+# (ந/ண/ன, ல/ள/ழ, ர/ற) fold together, and repeats collapse.
+TAMIL_CONSONANTS = {
+    "க": "k", "ங": "n", "ச": "s", "ஞ": "n", "ட": "t", "ண": "n", "த": "t", "ந": "n",
+    "ப": "p", "ம": "m", "ய": "y", "ர": "r", "ல": "l", "வ": "v", "ழ": "l", "ள": "l",
+    "ற": "r", "ன": "n", "ஜ": "s", "ஷ": "s", "ஸ": "s", "ஶ": "s",
+}
+LATIN_DIGRAPHS = (("zh", "l"), ("sh", "s"), ("ch", "s"), ("ph", "p"), ("x", "ks"))
+LATIN_CONSONANTS = str.maketrans({
+    "b": "p", "c": "k", "d": "t", "f": "p", "g": "k", "j": "s", "q": "k", "w": "v", "z": "s",
+})
+
+
+def _skeleton(token):
+    if any(ch in TAMIL_CONSONANTS for ch in token):
+        letters = [TAMIL_CONSONANTS[ch] for ch in token if ch in TAMIL_CONSONANTS]
+    else:
+        for digraph, sound in LATIN_DIGRAPHS:
+            token = token.replace(digraph, sound)
+        # y after a consonant is a vowel ("Kandasamy" = கந்தசாமி)
+        token = re.sub(r"(?<=[^aeiouy])y", "", token)
+        letters = [ch for ch in token.translate(LATIN_CONSONANTS) if ch in "kmnprstvly"]
+    out = []
+    for ch in letters:
+        if not out or out[-1] != ch:
+            out.append(ch)
+    return "".join(out)
+
+
+def phonetic_name(name):
+    # initials ("மு.", "K") carry a single consonant at most; drop them so
+    # "மு. முருகன்" and "Murugan" meet
+    parts = sorted(s for s in (_skeleton(t) for t in name_tokens(name)) if len(s) > 1)
+    return "-".join(parts)
+
+
+DOB_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y", "%Y/%m/%d")
+
+
+def _dob(value):
+    value = str(value or "").strip()
+    for fmt in DOB_FORMATS:
+        try:
+            return datetime.strptime(value[:10], fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return ""
+
+
+# ===================== BLOCKING KEYS =====================
+
+# Called on startup so a missing secret stops the server, not a register.
+def check_secret():
+    if not DEDUPE_SECRET:
+        raise RuntimeError("DEDUPE_SECRET is not set")
+
+
+def dedupe_keys(doc):
+    keys = []
+    voter_id = re.sub(r"[^0-9A-Z]", "", str(doc.get("voter_id") or "").upper())
+    if len(voter_id) >= 6:
+        keys.append("v:" + voter_id)
+    aadhaar = re.sub(r"\D", "", str(doc.get("aadhaar") or ""))
+    if len(aadhaar) == 12:
+        check_secret()
+        keys.append("a:" + hmac.new(DEDUPE_SECRET, aadhaar.encode(), hashlib.sha256).hexdigest()[:32])
+    name, father, dob = phonetic_name(doc.get("name")), phonetic_name(doc.get("father_name")), _dob(doc.get("dob"))
+    if name and father and dob:
+        keys.append(f"p:{name}|{father}|{dob}")
+    return keys
+
+
+def is_strong(key):
+    return key.startswith(STRONG_KEYS)
+
+
+# Blocking (pymongo) - call through run_db. One query for a whole batch;
+# returns, per doc, the existing members sharing each of its keys:
+# [{key: [member, ...]}, ...] in the order of docs.
+def find_matches(docs):
+    wanted = {k for d in docs for k in d.get("dedupe_keys", ())}
+    if not wanted:
+        return [{} for _ in docs]
+    by_key = {}
+    found = candidates_collection.find({"dedupe_keys": {"$in": list(wanted)}}, MATCH_PROJECTION)
+    for c in found.limit(DEDUPE_MAX_MATCHES * len(wanted)):
+        for k in c.get("dedupe_keys", ()):
+            if k in wanted:
+                by_key.setdefault(k, []).append(c)
+    return [
+        {k: by_key[k][:DEDUPE_MAX_MATCHES] for k in d.get("dedupe_keys", ()) if k in by_key}
+        for d in docs
+    ]
+
+
+def strong_match(matches):
+    for key, members in matches.items():
+        if is_strong(key):
+            return key, members[0]
+    return None, None
+
+
+# Admin-facing (import report). Public endpoints answer ALREADY_REGISTERED
+# only: voter IDs are on the electoral rolls, so naming the key or the
+# membership number would let anyone look up who is a party member.
+def duplicate_message(key, member):
+    what = "Voter ID" if key.startswith("v:") else "Aadhaar number"
+    return f"{what} already registered (membership no {member.get('membership_no') or '-'})"
+
+
+ALREADY_REGISTERED = "Already registered"
+
+
+# ===================== REVIEW QUEUE =====================
+# One document per cluster of suspected duplicates. The _id is derived
+# from the members, so re-running the batch job or a second phonetic hit
+# on the same group updates the entry instead of adding one; a decision
+# ("distinct", "merged") sticks until the cluster grows.
+REVIEW_STATUSES = ("open", "distinct", "merged")
+
+
+def _review_id(members):
+    return hashlib.sha1("|".join(sorted(members)).encode()).hexdigest()[:24]
+
+
+def queue_review(members, keys, now=None, attempt=None):
+    members = sorted(set(members))
+    now = now or datetime.utcnow()
+    review_id = _review_id(members)
+    update = {
+        "$set": {"members": members, "keys": sorted(keys), "updated_at": now,
+                 "strong": any(is_strong(k) for k in keys)},
+        "$setOnInsert": {"status": "open", "created_at": now},
+    }
+    if attempt:
+        update["$push"] = {"attempts": {"$each": [attempt], "$slice": -20}}
+    reviews_collection.update_one({"_id": review_id}, update, upsert=True)
+    # an open review of part of this cluster is superseded by it (blocked
+    # attempts are kept: nothing else records them)
+    reviews_collection.delete_many({
+        "_id": {"$ne": review_id},
+        "status": "open",
+        "attempts": {"$exists": False},
+        "members": {"$in": members, "$not": {"$elemMatch": {"$nin": members}}},
+    })
+
+
+# A registration rejected on a strong key: the caller was told
+# ALREADY_REGISTERED, admins see which member it hit.
+def record_blocked(key, member, doc):
+    logger.info("Registration from %s blocked: %s matches %s", doc.get("mobile"),
+                "voter ID" if key.startswith("v:") else "aadhaar", member.get("membership_no"))
+    if member.get("membership_no"):
+        attempt = {"mobile": doc.get("mobile"), "name": doc.get("name"), "at": datetime.utcnow()}
+        queue_review([member["membership_no"]], [key], attempt=attempt)
+
+
+def queue_matches(doc, matches):
+    keys = [k for k, members in matches.items() if members]
+    if keys:
+        members = [doc["membership_no"]] + [m["membership_no"] for k in keys for m in matches[k]
+                                            if m.get("membership_no")]
+        queue_review(members, keys)
+
+
+def list_reviews(status="open", limit=100, after=""):
+    query = {"status": status}
+    if after:
+        query["_id"] = {"$gt": after}
+    return list(reviews_collection.find(query).sort("_id", 1).limit(limit))
+
+
+def resolve_review(review_id, status, username):
+    result = reviews_collection.update_one(
+        {"_id": review_id},
+        {"$set": {"status": status, "resolved_by": username, "resolved_at": datetime.utcnow()}},
+    )
+    return result.matched_count == 1
+
+
+# ===================== BATCH CLUSTERING =====================
+# Groups the collection by key on the server ($unwind + $group over the
+# dedupe_keys index), then joins groups that share a member with
+# union-find, so A~B by voter ID and B~C by name end up one cluster.
+
+def _find(parent, x):
+    while parent.setdefault(x, x) != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+def cluster_duplicates():
+    with pymongo.timeout(DEDUPE_CLUSTER_TIMEOUT_SECONDS):
+        return _cluster_duplicates()
+
+
+def _cluster_duplicates():
+    pipeline = [
+        {"$match": {"dedupe_keys.0": {"$exists": True}, "membership_no": {"$exists": True}}},
+        {"$project": {"membership_no": 1, "dedupe_keys": 1}},
+        {"$unwind": "$dedupe_keys"},
+        {"$group": {"_id": "$dedupe_keys", "members": {"$push": "$membership_no"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ]
+    parent, cluster_keys, oversized = {}, {}, []
+    for group in candidates_collection.aggregate(pipeline, allowDiskUse=True):
+        members = group["members"]
+        if len(members) > DEDUPE_MAX_MATCHES:
+            oversized.append((group["_id"], len(members)))
+            continue
+        root = _find(parent, members[0])
+        for m in members[1:]:
+            other = _find(parent, m)
+            if other != root:
+                parent[other] = root
+                cluster_keys.setdefault(root, set()).update(cluster_keys.pop(other, ()))
+        cluster_keys.setdefault(root, set()).add(group["_id"])
+
+    clusters = {}
+    for m in parent:
+        clusters.setdefault(_find(parent, m), []).append(m)
+
+    now = datetime.utcnow()
+    for root, members in clusters.items():
+        queue_review(members, cluster_keys[root], now)
+    for key, n in oversized:
+        logger.warning("Dedupe key %s shared by %d members; skipped", key[:40], n)
+    return {"clusters": len(clusters), "members": len(parent), "oversized_keys": len(oversized)}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr, format="%(message)s")
+    print(cluster_duplicates())
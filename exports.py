@@ -0,0 +1,206 @@
+# exports.py
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime
+import asyncio
+import os
+import uuid
+import zipfile
+
+from database import db, run_db
+from cardcache import CARD_PROJECTION
+from photostore import load_photo_bytes
+from streaming import ChunkWriter
+from workers import PROCESS_WORKERS, run_cpu
+
+# ===================== CONFIG =====================
+# Members pulled from the cursor per step; bounds memory to roughly one
+# batch being rendered plus the next one being prefetched.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "64"))
+# Cards per imposed PDF volume (one response). A ReportLab document is
+# built in memory, so this is what caps a PDF export's footprint.
+EXPORT_PDF_VOLUME_CARDS = int(os.getenv("EXPORT_PDF_VOLUME_CARDS", "1000"))  # 125 A4 sheets
+# Members per ZIP volume. Streamed, so this only bounds how much a cut-off
+# download costs to repeat.
+EXPORT_ZIP_VOLUME_CARDS = int(os.getenv("EXPORT_ZIP_VOLUME_CARDS", "5000"))
+
+EXPORT_FORMATS = ("zip", "pdf")
+
+candidates_collection = db["candidates"]
+export_jobs = db["export_jobs"]
+
+
+# ===================== JOBS =====================
+# A job is exported in numbered volumes, one response each (a complete ZIP
+# or PDF). The server can't tell whether a response reached the client, so
+# last_id only moves when the client confirms a volume: it passes
+# received=<X-Export-Volume> with its next request. A volume that was cut
+# off (a partial ZIP has no central directory) is simply served again.
+
+def build_filter(district="", constituency="", ward="", from_no="", to_no=""):
+    query = {}
+    if district:
+        query["district"] = district
+    if constituency:
+        query["constituency"] = constituency
+    if ward:
+        query["ward"] = ward
+    if from_no or to_no:
+        query["membership_no"] = {}
+        if from_no:
+            query["membership_no"]["$gte"] = from_no
+        if to_no:
+            query["membership_no"]["$lte"] = to_no
+    return query
+
+
+def create_job(query, fmt, username):
+    job = {
+        "_id": uuid.uuid4().hex,
+        "filter": query,
+        "format": fmt,
+        "status": "running",
+        "exported": 0,
+        "last_id": None,
+        "volume": 0,       # volumes the client confirmed
+        "pending": None,   # the volume served last, until confirmed
+        "created_by": username,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+    }
+    export_jobs.insert_one(job)
+    return job
+
+
+def served(job, last_id, count, done):
+    job["pending"] = {"volume": job.get("volume", 0) + 1, "last_id": last_id, "count": count, "done": done}
+    export_jobs.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"pending": job["pending"], "updated_at": datetime.utcnow()}},
+    )
+
+
+# Commits the pending volume if it is the one the client says it received;
+# anything else leaves the job where it was.
+def acknowledge(job, received):
+    pending = job.get("pending")
+    if not pending or pending["volume"] != received:
+        return job
+    job["last_id"] = pending["last_id"]
+    job["exported"] += pending["count"]
+    job["volume"] = received
+    job["status"] = "done" if pending["done"] else "running"
+    job["pending"] = None
+    export_jobs.update_one(
+        {"_id": job["_id"], "pending.volume": received},
+        {"$set": {
+            "last_id": job["last_id"],
+            "exported": job["exported"],
+            "volume": received,
+            "status": job["status"],
+            "pending": None,
+            "updated_at": datetime.utcnow(),
+        }},
+    )
+    return job
+
+
+def finish(job):
+    export_jobs.update_one({"_id": job["_id"]}, {"$set": {"status": "done", "pending": None}})
+
+
+def public_job(job):
+    out = dict(job)
+    out["last_id"] = str(job["last_id"]) if job["last_id"] is not None else None
+    if job.get("pending"):
+        out["pending"] = {**job["pending"], "last_id": str(job["pending"]["last_id"])}
+    return out
+
+
+# ===================== FEED =====================
+# One _id-ordered cursor per job; photos for a batch are read from disk in
+# threads while the previous batch renders.
+
+def _fetch_batch(job, after_id, limit):
+    query = dict(job["filter"])
+    if after_id is not None:
+        query["_id"] = {"$gt": after_id}
+    return list(
+        candidates_collection.find(query, CARD_PROJECTION)
+        .sort("_id", 1)
+        .limit(limit)
+    )
+
+
+# Members left after the confirmed volumes, counting no further than limit
+def remaining(job, limit):
+    query = dict(job["filter"])
+    if job["last_id"] is not None:
+        query["_id"] = {"$gt": job["last_id"]}
+    return candidates_collection.count_documents(query, limit=limit)
+
+
+async def _load_batch(job, after_id, limit):
+    docs = await run_db(_fetch_batch, job, after_id, limit)
+    photos = await asyncio.gather(*(run_in_threadpool(load_photo_bytes, d) for d in docs))
+    return list(zip(docs, photos))
+
+
+def _chunks(items, n):
+    size = max(1, -(-len(items) // n))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# ===================== ZIP: one PDF per member =====================
+# done: whether this volume holds everything left (see remaining()).
+
+async def stream_zip(job, done):
+    from idcard import render_idcards  # ReportLab only when an export runs
+
+    out = ChunkWriter()
+    zf = zipfile.ZipFile(out, "w", zipfile.ZIP_STORED)  # PDFs are already compressed
+
+    after_id, sent = job["last_id"], 0
+    batch = await _load_batch(job, after_id, min(EXPORT_BATCH_SIZE, EXPORT_ZIP_VOLUME_CARDS))
+    while batch:
+        after_id = batch[-1][0]["_id"]
+        sent += len(batch)
+        left = EXPORT_ZIP_VOLUME_CARDS - sent
+        next_batch = asyncio.ensure_future(_load_batch(job, after_id, min(EXPORT_BATCH_SIZE, left))) if left > 0 else None
+        try:
+            parts = await asyncio.gather(*(run_cpu(render_idcards, chunk)
+                                           for chunk in _chunks(batch, PROCESS_WORKERS)))
+            pdfs = [pdf for part in parts for pdf in part]
+            for (cnd, _), pdf in zip(batch, pdfs):
+                zf.writestr(f"{cnd.get('membership_no') or cnd['mobile']}.pdf", pdf)
+            yield out.drain()
+        except BaseException:
+            # client went away; nothing is confirmed until it says so
+            if next_batch:
+                next_batch.cancel()
+            raise
+        batch = await next_batch if next_batch else []
+
+    zf.close()
+    yield out.drain()
+    await run_db(served, job, after_id, sent, done)
+
+
+# ===================== PDF: imposed A4 sheets =====================
+# The whole volume is rendered before the response starts, so it is
+# recorded as served right away (the caller calls served()).
+
+async def render_pdf_volume(job):
+    from idcard import render_sheets
+
+    cards = []
+    after_id = job["last_id"]
+    while len(cards) < EXPORT_PDF_VOLUME_CARDS:
+        batch = await _load_batch(job, after_id, min(EXPORT_BATCH_SIZE, EXPORT_PDF_VOLUME_CARDS - len(cards)))
+        if not batch:
+            break
+        cards.extend(batch)
+        after_id = batch[-1][0]["_id"]
+
+    more = bool(cards) and bool(await run_db(_fetch_batch, job, after_id, 1))
+    pdf = await run_cpu(render_sheets, cards) if cards else None
+    return pdf, after_id, len(cards), not more
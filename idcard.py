@@ -0,0 +1,350 @@
+# idcard.py
+import io
+
+# ===================== REPORTLAB =====================
+from reportlab.lib.pagesizes import A4, A7, landscape
+from reportlab.lib.colors import HexColor
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.lib.utils import ImageReader
+
+from cardcache import IDCARD_LAYOUT
+from verification import qr_data
+
+CARD_SIZE = landscape(A7)
+
+# A4 print sheet: 2 x 4 landscape A7 cards fill the page exactly
+SHEET_SIZE = A4
+SHEET_COLUMNS = 2
+SHEET_ROWS = 4
+CARDS_PER_SHEET = SHEET_COLUMNS * SHEET_ROWS
+
+
+# ===================== LAYOUTS =====================
+# Declarative card designs. "background" is drawn under the photo,
+# "overlay" above it; both are static and become form XObjects. Only
+# "photo", "fields" and the verification QR code ("qr": x, y, size) change
+# per member. Field text is formatted with name, name_upper, mobile,
+# district and membership_no.
+
+W, H = CARD_SIZE
+DARK = "#1B5E20"
+LIGHT = "#E8F5E9"
+BAR = 10 * mm
+PHOTO_R = 15 * mm
+PHOTO_X = BAR + 20 * mm
+PHOTO_Y = H / 2
+TEXT_X = PHOTO_X + PHOTO_R + 7 * mm
+TEXT_Y = PHOTO_Y + 15 * mm
+QR_SIZE = 20 * mm
+
+LAYOUTS = {
+    # main.py's original card
+    "classic": {
+        "fonts": [],
+        "background": [
+            {"rect": (0, 0, BAR, H), "fill": DARK},
+            {"rect": (W - BAR, 0, BAR, H), "fill": DARK},
+            {"rect": (BAR, 0, W - 2 * BAR, H), "fill": LIGHT},
+            {"text": "PASUMAI BHARAT MAKKAL KATCHI", "at": (W / 2, H - 10 * mm),
+             "font": "Helvetica-Bold", "size": 12, "color": DARK, "align": "centre"},
+        ],
+        "photo": (PHOTO_X - PHOTO_R, PHOTO_Y - PHOTO_R, 2 * PHOTO_R, 2 * PHOTO_R),
+        "qr": (W - BAR - QR_SIZE - 4 * mm, 4 * mm, QR_SIZE),
+        "overlay": [
+            {"circle": (PHOTO_X, PHOTO_Y, PHOTO_R), "stroke": DARK, "width": 1},
+        ],
+        "fields": [
+            {"text": "{name_upper}", "at": (TEXT_X, TEXT_Y), "font": "Helvetica-Bold", "size": 9, "color": DARK},
+            {"text": "Mobile: {mobile}", "at": (TEXT_X, TEXT_Y - 12), "font": "Helvetica-Bold", "size": 9, "color": DARK},
+            {"text": "District: {district}", "at": (TEXT_X, TEXT_Y - 24), "font": "Helvetica-Bold", "size": 9, "color": DARK},
+            {"text": "ID: {membership_no}", "at": (TEXT_X, TEXT_Y - 36), "font": "Helvetica-Bold", "size": 9, "color": DARK},
+        ],
+    },
+    # templates/idcard.html
+    "html": {
+        "fonts": ["HeiseiMin-W3"],
+        "background": [
+            {"rect": (0, 0, BAR, H), "fill": DARK},
+            {"rect": (W - BAR, 0, BAR, H), "fill": DARK},
+            {"rect": (BAR, 0, W - 2 * BAR, H), "fill": LIGHT},
+            {"text": "பசுமை பாரத மக்கள் கட்சி", "at": (TEXT_X, TEXT_Y + 6),
+             "font": "HeiseiMin-W3", "size": 9, "color": DARK},
+        ],
+        "photo": (PHOTO_X - PHOTO_R, PHOTO_Y - PHOTO_R, 2 * PHOTO_R, 2 * PHOTO_R),
+        "qr": (W - BAR - QR_SIZE - 4 * mm, 4 * mm, QR_SIZE),
+        "overlay": [
+            {"circle": (PHOTO_X, PHOTO_Y, PHOTO_R), "stroke": DARK, "width": 1.5},
+        ],
+        "fields": [
+            {"text": "Name: {name}", "at": (TEXT_X, TEXT_Y - 10), "font": "Helvetica", "size": 7.5, "color": DARK},
+            {"text": "Mobile: {mobile}", "at": (TEXT_X, TEXT_Y - 20), "font": "Helvetica", "size": 7.5, "color": DARK},
+            {"text": "District: {district}", "at": (TEXT_X, TEXT_Y - 30), "font": "Helvetica", "size": 7.5, "color": DARK},
+            {"text": "ID: {membership_no}", "at": (TEXT_X, TEXT_Y - 40), "font": "Helvetica", "size": 7.5, "color": DARK},
+        ],
+    },
+    # oldmain.py's front/back card
+    "two_sided": {
+        "fonts": ["HeiseiMin-W3"],
+        "background": [
+            {"rect": (0, 0, W, H), "fill": "#FFFFFF", "stroke": "#000000"},
+            {"round_rect": (W - 30 * mm, -10 * mm, 40 * mm, H + 20 * mm, 40), "fill": "#0F7A3E", "stroke": "#000000"},
+            {"round_rect": (W - 38 * mm, -10 * mm, 30 * mm, H + 20 * mm, 40), "fill": "#5FB48C", "stroke": "#000000"},
+            {"text": "பசுமை பாரத மக்கள் கட்சி", "at": (8 * mm, H - 12 * mm),
+             "font": "HeiseiMin-W3", "size": 10, "color": "#0F7A3E"},
+            {"line": (8 * mm, H - 29 * mm, W - 45 * mm, H - 29 * mm), "stroke": "#000000", "width": 0.5},
+        ],
+        "photo": (W - 28 * mm, H - 40 * mm, 20 * mm, 26 * mm),
+        "qr": (45 * mm, 3 * mm, 16 * mm),
+        "overlay": [],
+        "fields": [
+            {"text": "{name_upper}", "at": (8 * mm, H - 26 * mm), "font": "Helvetica-Bold", "size": 12, "color": "#000000"},
+            {"text": "Mobile: {mobile}", "at": (8 * mm, H - 38 * mm), "font": "Helvetica", "size": 7, "color": "#000000"},
+            {"text": "District: {district}", "at": (8 * mm, H - 46 * mm), "font": "Helvetica", "size": 7, "color": "#000000"},
+            {"text": "ID : {membership_no}", "at": (8 * mm, H - 54 * mm), "font": "Helvetica", "size": 7, "color": "#000000"},
+        ],
+        "back": [
+            {"rect": (0, 0, W, H), "fill": "#FFFFFF", "stroke": "#000000"},
+            {"text": "உறுப்பினர் விதிமுறைகள்", "at": (W / 2, H - 20 * mm),
+             "font": "HeiseiMin-W3", "size": 8, "color": "#000000", "align": "centre"},
+            {"text": "This card is for official identification only", "at": (W / 2, H - 30 * mm),
+             "font": "Helvetica", "size": 6, "color": "#000000", "align": "centre"},
+            {"text": "If found, please return to party office", "at": (W / 2, H - 38 * mm),
+             "font": "Helvetica", "size": 6, "color": "#000000", "align": "centre"},
+            {"line": (10 * mm, 15 * mm, 45 * mm, 15 * mm), "stroke": "#000000", "width": 1},
+            {"text": "Authorized Signature", "at": (10 * mm, 10 * mm),
+             "font": "Helvetica", "size": 6, "color": "#000000"},
+            {"circle": (W - 20 * mm, 15 * mm, 8 * mm), "stroke": "#000000", "width": 1},
+            {"text": "OFFICIAL", "at": (W - 20 * mm, 10 * mm),
+             "font": "Helvetica", "size": 6, "color": "#000000", "align": "centre"},
+        ],
+    },
+}
+
+
+# ===================== TEMPLATE ENGINE =====================
+# Layouts are compiled once per process (colours resolved, fonts
+# registered). Within a document each static layer is drawn once into a
+# form XObject and every card just references it, so a sheet of N cards
+# carries the artwork once instead of N times.
+
+_compiled = {}
+_registered_fonts = set()
+
+
+def _compile_elements(elements):
+    out = []
+    for el in elements:
+        el = dict(el)
+        for key in ("fill", "stroke", "color"):
+            if key in el:
+                el[key] = HexColor(el[key])
+        out.append(el)
+    return out
+
+
+def _layout(name):
+    layout = _compiled.get(name)
+    if layout is None:
+        spec = LAYOUTS[name]
+        for font in spec["fonts"]:
+            if font not in _registered_fonts:
+                pdfmetrics.registerFont(UnicodeCIDFont(font))
+                _registered_fonts.add(font)
+        layout = {
+            "background": _compile_elements(spec["background"]),
+            "overlay": _compile_elements(spec["overlay"]),
+            "fields": _compile_elements(spec["fields"]),
+            "back": _compile_elements(spec.get("back", [])),
+            "photo": spec["photo"],
+            "qr": spec.get("qr"),
+        }
+        _compiled[name] = layout
+    return layout
+
+
+def _draw_elements(c, elements, values=None):
+    for el in elements:
+        if "text" in el:
+            text = el["text"].format_map(values) if values is not None else el["text"]
+            c.setFont(el["font"], el["size"])
+            c.setFillColor(el["color"])
+            if el.get("align") == "centre":
+                c.drawCentredString(*el["at"], text)
+            else:
+                c.drawString(*el["at"], text)
+            continue
+
+        if "stroke" in el:
+            c.setStrokeColor(el["stroke"])
+            c.setLineWidth(el.get("width", 1))
+        if "fill" in el:
+            c.setFillColor(el["fill"])
+        fill = 1 if "fill" in el else 0
+        stroke = 1 if "stroke" in el else 0
+
+        if "rect" in el:
+            c.rect(*el["rect"], fill=fill, stroke=stroke)
+        elif "round_rect" in el:
+            c.roundRect(*el["round_rect"], fill=fill, stroke=stroke)
+        elif "circle" in el:
+            c.circle(*el["circle"], fill=fill, stroke=stroke)
+        elif "line" in el:
+            c.line(*el["line"])
+
+
+# Vector QR: dark modules merged into horizontal runs and filled as one
+# path, so a card gains a few hundred bytes and no image.
+def _draw_qr(c, data, box):
+    import qrcode
+
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=0)
+    qr.add_data(data)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+
+    x, y, size = box
+    quiet = 2  # modules of white margin
+    module = size / (len(matrix) + 2 * quiet)
+    c.setFillColor(HexColor("#FFFFFF"))
+    c.rect(x, y, size, size, fill=1, stroke=0)
+
+    p = c.beginPath()
+    top = y + size - quiet * module
+    for r, row in enumerate(matrix):
+        col = 0
+        while col < len(row):
+            if not row[col]:
+                col += 1
+                continue
+            start = col
+            while col < len(row) and row[col]:
+                col += 1
+            p.rect(x + (quiet + start) * module, top - (r + 1) * module, (col - start) * module, module)
+    c.setFillColor(HexColor("#000000"))
+    c.drawPath(p, fill=1, stroke=0)
+
+
+def _static(c, layout_name, part, elements, precompiled):
+    if not elements:
+        return
+    if not precompiled:
+        _draw_elements(c, elements)
+        return
+
+    forms = c.__dict__.setdefault("_card_forms", set())
+    name = f"{layout_name}_{part}"
+    if name not in forms:
+        c.beginForm(name, 0, 0, W, H)
+        _draw_elements(c, elements)
+        c.endForm()
+        forms.add(name)
+    c.doForm(name)
+
+
+def _values(cnd):
+    return {
+        "name": cnd.get("name", ""),
+        "name_upper": cnd.get("name", "").upper(),
+        "mobile": cnd.get("mobile", ""),
+        "district": cnd.get("district", ""),
+        "membership_no": cnd.get("membership_no", ""),
+    }
+
+
+def _clip_card(c):
+    # keeps bleeding artwork (two_sided's waves) off neighbouring cards
+    p = c.beginPath()
+    p.rect(0, 0, W, H)
+    c.clipPath(p, stroke=0, fill=0)
+
+
+def _draw_front(c, layout_name, cnd, photo_bytes, precompiled):
+    layout = _layout(layout_name)
+    _static(c, layout_name, "background", layout["background"], precompiled)
+
+    if photo_bytes:
+        c.drawImage(ImageReader(io.BytesIO(photo_bytes)), *layout["photo"],
+                    mask="auto", preserveAspectRatio=True)
+
+    _static(c, layout_name, "overlay", layout["overlay"], precompiled)
+    _draw_elements(c, layout["fields"], _values(cnd))
+
+    data = qr_data(cnd) if layout["qr"] else ""
+    if data:
+        _draw_qr(c, data, layout["qr"])
+
+
+def _draw_back(c, layout_name, precompiled):
+    _static(c, layout_name, "back", _layout(layout_name)["back"], precompiled)
+
+
+# ===================== RENDER =====================
+# All entry points run in the process pool (workers.run_cpu) and take
+# (cnd, photo_bytes) pairs so no worker ever touches Mongo or the disk.
+# A form only pays off once it is reused, so single cards draw the static
+# layers inline (benchmarks/idcard_render.py: a form adds ~0.9 KB to a
+# one-card PDF) and multi-card sheets stamp them.
+
+def render_idcard(cnd, photo_bytes=None, layout=None, precompiled=False):
+    layout = layout or IDCARD_LAYOUT
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=CARD_SIZE)
+    _draw_front(c, layout, cnd, photo_bytes, precompiled)
+    if _layout(layout)["back"]:
+        c.showPage()
+        _draw_back(c, layout, precompiled)
+    c.save()
+    return buffer.getvalue()
+
+
+def render_idcards(cards, layout=None, precompiled=False):
+    return [render_idcard(cnd, photo_bytes, layout, precompiled) for cnd, photo_bytes in cards]
+
+
+def _sheet_slot(slot, mirrored=False):
+    col, row = slot % SHEET_COLUMNS, slot // SHEET_COLUMNS
+    if mirrored:
+        # backs are printed on the reverse, so columns swap for duplex
+        col = SHEET_COLUMNS - 1 - col
+    return col * W, SHEET_SIZE[1] - (row + 1) * H
+
+
+def render_sheets(cards, layout=None, precompiled=True):
+    layout = layout or IDCARD_LAYOUT
+    two_sided = bool(_layout(layout)["back"])
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=SHEET_SIZE)
+
+    for start in range(0, len(cards), CARDS_PER_SHEET):
+        sheet = cards[start:start + CARDS_PER_SHEET]
+        if start:
+            c.showPage()
+
+        for slot, (cnd, photo_bytes) in enumerate(sheet):
+            x, y = _sheet_slot(slot)
+            c.saveState()
+            c.translate(x, y)
+            _clip_card(c)
+            _draw_front(c, layout, cnd, photo_bytes, precompiled)
+            c.restoreState()
+
+            # hairline cut guide
+            c.setStrokeColor(HexColor("#BDBDBD"))
+            c.setLineWidth(0.25)
+            c.rect(x, y, W, H, fill=0, stroke=1)
+
+        if two_sided:
+            c.showPage()
+            for slot in range(len(sheet)):
+                x, y = _sheet_slot(slot, mirrored=True)
+                c.saveState()
+                c.translate(x, y)
+                _clip_card(c)
+                _draw_back(c, layout, precompiled)
+                c.restoreState()
+
+    c.save()
+    return buffer.getvalue()
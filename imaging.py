@@ -0,0 +1,105 @@
+# imaging.py
+import io
+import os
+
+# ===================== LIMITS =====================
+MAX_PHOTO_BYTES = int(os.getenv("MAX_PHOTO_BYTES", str(8 * 1024 * 1024)))
+MAX_PHOTO_PIXELS = int(os.getenv("MAX_PHOTO_PIXELS", str(40_000_000)))
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP"}
+# What browsers/apps put on the multipart part. Some Android clients send
+# octet-stream or nothing; the magic-byte sniff still applies to those.
+ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/jpg", "image/png", "image/webp",
+                         "application/octet-stream", ""}
+
+# Square derivatives (px). "card" is the 30 mm ID card circle at ~300 dpi.
+DERIVATIVES = {
+    "card": 360,
+    "thumb": 128,
+}
+JPEG_QUALITY = 85
+
+
+class PhotoRejected(ValueError):
+    pass
+
+
+def sniff_image_format(data):
+    if data[:3] == b"\xff\xd8\xff":
+        return "JPEG"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "PNG"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+
+def check_content_type(content_type):
+    if (content_type or "").split(";")[0].strip().lower() not in ALLOWED_CONTENT_TYPES:
+        raise PhotoRejected("Photo must be a JPEG, PNG or WEBP image")
+
+
+def check_size(size):
+    if size > MAX_PHOTO_BYTES:
+        raise PhotoRejected(f"Photo larger than {MAX_PHOTO_BYTES // (1024 * 1024)} MB")
+
+
+# Cheap checks that run before anything is decoded. With size given, data
+# only needs to be the first 12 bytes.
+def check_photo(data, size=None):
+    check_size(len(data) if size is None else size)
+    if sniff_image_format(data[:12]) not in ALLOWED_FORMATS:
+        raise PhotoRejected("Photo must be a JPEG, PNG or WEBP image")
+
+
+# ===================== PIPELINE =====================
+# Runs in the process pool (workers.run_cpu); must stay a plain top-level
+# function so it can be pickled.
+
+def make_derivatives(data):
+    check_photo(data)
+    return _derive(io.BytesIO(data))
+
+
+# Same, reading a spooled upload from disk so the full upload never has to
+# be held (or pickled to the worker) in memory
+def make_derivatives_from_file(path):
+    with open(path, "rb") as f:
+        check_photo(f.read(12), os.fstat(f.fileno()).st_size)
+        f.seek(0)
+        return _derive(f)
+
+
+def _derive(fp):
+    # Pillow is only needed in the pool workers, not at app import
+    from PIL import Image, ImageOps
+
+    # Pillow's own decompression-bomb guard, aligned with ours
+    Image.MAX_IMAGE_PIXELS = MAX_PHOTO_PIXELS
+
+    try:
+        im = Image.open(fp)
+        if im.format not in ALLOWED_FORMATS:
+            raise PhotoRejected("Photo must be a JPEG, PNG or WEBP image")
+        width, height = im.size
+        if width * height > MAX_PHOTO_PIXELS:
+            raise PhotoRejected("Photo dimensions too large")
+
+        # let libjpeg downscale while decoding; we never need full size
+        largest = max(DERIVATIVES.values())
+        im.draft("RGB", (largest * 2, largest * 2))
+
+        # apply EXIF orientation, then drop all metadata by re-encoding
+        im = ImageOps.exif_transpose(im)
+        im = im.convert("RGB")
+    except PhotoRejected:
+        raise
+    except (OSError, Image.DecompressionBombError, SyntaxError) as e:
+        raise PhotoRejected("Photo could not be read") from e
+
+    out = {}
+    for name, size in DERIVATIVES.items():
+        thumb = ImageOps.fit(im, (size, size), Image.LANCZOS, centering=(0.5, 0.5))
+        buf = io.BytesIO()
+        thumb.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=size > 256)
+        out[name] = buf.getvalue()
+    return out
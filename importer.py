@@ -0,0 +1,233 @@
+# importer.py
+from pymongo.errors import BulkWriteError
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import csv
+import io
+import logging
+import os
+import xml.etree.ElementTree as ET
+import zipfile
+
+from candidates import MEMBER_SCHEMA, validate_member
+from database import db, run_db
+from dedupe import dedupe_keys, duplicate_message, find_matches, is_strong, queue_matches, strong_match
+from imaging import MAX_PHOTO_BYTES, PhotoRejected
+from photostore import store_photo
+from search import name_tokens
+from sequences import allocate_membership_nos
+from stats import record_members
+from xlsx import iter_xlsx_rows
+
+logger = logging.getLogger(__name__)
+
+candidates_collection = db["candidates"]
+
+# ===================== CONFIG =====================
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "200000"))
+IMPORT_MAX_ERRORS = 1000  # per-row errors echoed back; the count is always exact
+PHOTO_CONCURRENCY = 8
+
+
+class ImportRejected(ValueError):
+    pass
+
+
+# ===================== PARSING =====================
+
+def _header_key(h):
+    return str(h or "").strip().lower().replace(" ", "_")
+
+
+def _read_rows(fileobj, filename):
+    name = (filename or "").lower()
+    if name.endswith(".xlsx"):
+        rows = iter_xlsx_rows(fileobj)
+    elif name.endswith(".csv"):
+        rows = csv.reader(io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline=""))
+    else:
+        raise ImportRejected("Upload a .csv or .xlsx file")
+
+    header = [_header_key(h) for h in next(rows, [])]
+    missing = [field for field, _, required, _ in MEMBER_SCHEMA if required and field not in header]
+    if missing:
+        raise ImportRejected(f"Header row is missing: {', '.join(missing)}")
+
+    out = []
+    for row in rows:
+        if not any(v not in (None, "") for v in row):
+            continue  # blank line
+        out.append(dict(zip(header, row)))
+        if len(out) > IMPORT_MAX_ROWS:
+            raise ImportRejected(f"At most {IMPORT_MAX_ROWS} rows per import")
+    return out
+
+
+def read_rows(fileobj, filename):
+    try:
+        return _read_rows(fileobj, filename)
+    except (UnicodeDecodeError, csv.Error):
+        raise ImportRejected("CSV file must be UTF-8 encoded")
+    except (zipfile.BadZipFile, KeyError, ET.ParseError):
+        raise ImportRejected("Could not read the XLSX file")
+
+
+def open_photo_zip(fileobj):
+    try:
+        return zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise ImportRejected("Photos must be a .zip file")
+
+
+# Photos ZIP: matched by a "photo" column (file name) or <mobile>.<ext>
+def index_photos(zf):
+    photos = {}
+    for info in zf.infolist():
+        if info.is_dir():
+            continue
+        base = os.path.basename(info.filename).lower()
+        photos.setdefault(base, info)
+        photos.setdefault(os.path.splitext(base)[0], info)
+    return photos
+
+
+# A "photo" cell the way index_photos keys the ZIP: bare file name, lower case
+def _photo_ref(value):
+    return os.path.basename(str(value or "").strip().replace("\\", "/")).lower()
+
+
+def _read_photo(zf, info):
+    if info.file_size > MAX_PHOTO_BYTES:
+        raise PhotoRejected(f"Photo larger than {MAX_PHOTO_BYTES // (1024 * 1024)} MB")
+    return zf.read(info)
+
+
+# ===================== IMPORT =====================
+
+def _existing_mobiles(mobiles):
+    return {
+        c["mobile"]
+        for c in candidates_collection.find({"mobile": {"$in": list(mobiles)}}, {"mobile": 1, "_id": 0})
+    }
+
+
+# Returns (inserted docs, {index: error message})
+def _insert(docs):
+    try:
+        candidates_collection.insert_many(docs, ordered=False)
+        return docs, {}
+    except BulkWriteError as e:
+        failed = {
+            err["index"]: "Mobile number already registered" if err.get("code") == 11000 else err.get("errmsg", "Insert failed")
+            for err in e.details["writeErrors"]
+        }
+        return [d for i, d in enumerate(docs) if i not in failed], failed
+
+
+async def import_members(rows, photos_zip=None):
+    report = {"total_rows": len(rows), "inserted": 0, "failed": 0, "errors": []}
+
+    def fail(row_no, mobile, message):
+        report["failed"] += 1
+        if len(report["errors"]) < IMPORT_MAX_ERRORS:
+            report["errors"].append({"row": row_no, "mobile": mobile, "error": message})
+
+    photo_index = index_photos(photos_zip) if photos_zip else {}
+    photo_slots = asyncio.Semaphore(PHOTO_CONCURRENCY)
+    seen_mobiles = set()
+    seen_keys = {}  # strong dedupe key -> first row using it
+
+    async def attach_photo(row_no, row, doc):
+        named = _photo_ref(row.get("photo"))
+        ref = named or doc["mobile"].lower()
+        info = photo_index.get(ref) or photo_index.get(os.path.splitext(ref)[0])
+        if not info:
+            if named:
+                fail(row_no, doc["mobile"], f"photo: {named} not found in the ZIP")
+                return False
+            doc.update({"photo": "", "photo_thumb": ""})
+            return True
+        try:
+            async with photo_slots:
+                data = await run_in_threadpool(_read_photo, photos_zip, info)
+                doc.update(await store_photo(data))
+            return True
+        except PhotoRejected as e:
+            fail(row_no, doc["mobile"], f"photo: {e}")
+            return False
+
+    for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+        # row numbers as the user sees them in the sheet (header is row 1)
+        batch = list(enumerate(rows[start:start + IMPORT_BATCH_SIZE], start=start + 2))
+
+        valid = []
+        for row_no, row in batch:
+            doc, error = validate_member(row)
+            if error:
+                fail(row_no, str(row.get("mobile") or ""), error)
+            elif doc["mobile"] in seen_mobiles:
+                fail(row_no, doc["mobile"], "Duplicate mobile in file")
+            else:
+                seen_mobiles.add(doc["mobile"])
+                valid.append((row_no, row, doc))
+
+        existing = await run_db(_existing_mobiles, {doc["mobile"] for _, _, doc in valid})
+        unique = []
+        for row_no, row, doc in valid:
+            if doc["mobile"] in existing:
+                fail(row_no, doc["mobile"], "Mobile number already registered")
+                continue
+            doc["dedupe_keys"] = dedupe_keys(doc)
+            repeated = next((k for k in doc["dedupe_keys"] if is_strong(k) and k in seen_keys), None)
+            if repeated:
+                fail(row_no, doc["mobile"], f"Same voter ID / aadhaar as row {seen_keys[repeated]}")
+                continue
+            seen_keys.update((k, row_no) for k in doc["dedupe_keys"] if is_strong(k))
+            unique.append((row_no, row, doc))
+
+        fresh, review = [], {}
+        for (row_no, row, doc), matches in zip(unique, await run_db(find_matches, [d for _, _, d in unique])):
+            key, member = strong_match(matches)
+            if key:
+                fail(row_no, doc["mobile"], duplicate_message(key, member))
+                continue
+            if matches:
+                review[doc["mobile"]] = matches
+            fresh.append((row_no, row, doc))
+
+        if photo_index:
+            ok = await asyncio.gather(*(attach_photo(*item) for item in fresh))
+            fresh = [item for item, good in zip(fresh, ok) if good]
+        else:
+            for _, _, doc in fresh:
+                doc.update({"photo": "", "photo_thumb": ""})
+
+        if not fresh:
+            continue
+
+        numbers = await run_db(allocate_membership_nos, len(fresh))
+        docs = []
+        for (_, _, doc), number in zip(fresh, numbers):
+            docs.append({"membership_no": number, **doc, "name_tokens": name_tokens(doc["name"])})
+
+        inserted, failed = await run_db(_insert, docs)
+        for i, message in failed.items():
+            # typically lost a race with a live registration of the same mobile
+            fail(fresh[i][0], fresh[i][2]["mobile"], message)
+        report["inserted"] += len(inserted)
+
+        try:
+            await run_db(record_members, inserted)
+        except Exception:
+            logger.exception("Could not update membership stats after import")
+
+        try:
+            for doc in inserted:
+                if doc["mobile"] in review:
+                    await run_db(queue_matches, doc, review[doc["mobile"]])
+        except Exception:
+            logger.exception("Could not queue duplicate reviews after import")
+
+    report["errors"].sort(key=lambda e: e["row"])
+    return report
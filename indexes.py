@@ -0,0 +1,105 @@
+# indexes.py
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+import logging
+import sys
+
+from database import db
+from regqueue import REJECTION_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# ===================== DECLARED INDEXES =====================
+# collection -> [(keys, options)]. Keep every hot query covered here;
+# check_query_plans() below fails if one of them falls back to a COLLSCAN.
+INDEXES = {
+    "candidates": [
+        ([("mobile", ASCENDING)], {"unique": True}),
+        ([("membership_no", ASCENDING)], {"unique": True, "sparse": True}),
+        ([("district", ASCENDING)], {}),
+        # /admin/candidates/search: multikey over normalized name words
+        ([("name_tokens", ASCENDING)], {}),
+        ([("voter_id", ASCENDING)], {}),
+        # dedupe.py blocking keys
+        ([("dedupe_keys", ASCENDING)], {}),
+        # keyset scans (bulk export) filter by area and walk _id
+        ([("district", ASCENDING), ("constituency", ASCENDING), ("ward", ASCENDING), ("_id", ASCENDING)], {}),
+    ],
+    "admins": [
+        # token_version too, so get_current_admin's check is index-only
+        ([("username", ASCENDING), ("active", ASCENDING), ("token_version", ASCENDING)], {}),
+    ],
+    "registration_rejections": [
+        ([("created_at", ASCENDING)], {"expireAfterSeconds": REJECTION_TTL_SECONDS}),
+    ],
+    "dedupe_reviews": [
+        ([("status", ASCENDING), ("_id", ASCENDING)], {}),
+        ([("members", ASCENDING)], {}),
+    ],
+}
+
+# Representative query per route: (collection, filter, used by)
+ROUTE_QUERIES = [
+    ("candidates", {"mobile": "9999999999"}, "register / generate_idcard"),
+    ("candidates", {"membership_no": "PBM-2000-000001"}, "membership lookups"),
+    ("candidates", {"district": "சென்னை"}, "district filters"),
+    ("candidates", {"mobile": {"$regex": "^98765"}}, "search by mobile prefix"),
+    ("candidates", {"name_tokens": {"$regex": "^முரு"}}, "search by name"),
+    ("candidates", {"voter_id": "ABC1234567"}, "search by voter ID"),
+    ("candidates", {"dedupe_keys": {"$in": ["v:ABC1234567"]}}, "register duplicate check"),
+    ("dedupe_reviews", {"status": "open"}, "duplicate review queue"),
+    ("admins", {"username": "superadmin", "active": True}, "admin_login / get_current_admin"),
+]
+
+
+# ===================== BOOTSTRAP =====================
+
+def ensure_indexes():
+    # create_index is a no-op when an identical index exists, so this is
+    # safe to run on every start.
+    missing_unique = []
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                logger.error("Could not create index %s %s: %s", collection, keys, e)
+                if options.get("unique"):
+                    missing_unique.append(f"{collection} {[k for k, _ in keys]}")
+    # register relies on unique indexes alone to refuse duplicates (e.g.
+    # mobile), so without one the app must not report ready. Usually
+    # duplicates left by the old find-then-insert: clean them up and restart.
+    if missing_unique:
+        raise RuntimeError("Missing unique index: " + "; ".join(missing_unique))
+
+
+# ===================== QUERY PLAN GUARD =====================
+
+def _plan_stages(plan):
+    yield plan.get("stage")
+    if "inputStage" in plan:
+        yield from _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+def check_query_plans():
+    failures = []
+    for collection, query, used_by in ROUTE_QUERIES:
+        explain = db[collection].find(query).explain()
+        planner = explain.get("queryPlanner", {})
+        plan = planner.get("winningPlan", {})
+        # SBE-era servers nest the classic plan under queryPlan
+        plan = plan.get("queryPlan", plan)
+        if "COLLSCAN" in _plan_stages(plan):
+            failures.append(f"{collection} {query} ({used_by})")
+
+    if failures:
+        raise RuntimeError("COLLSCAN in query plan for: " + "; ".join(failures))
+
+
+if __name__ == "__main__":
+    ensure_indexes()
+    if "--check" in sys.argv:
+        check_query_plans()
+    print("✅ Indexes OK")
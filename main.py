@@ -1,37 +1,124 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import StreamingResponse
-from fastapi import Depends, Header
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi import Depends, Header, Query
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
-import os, io
-import base64
+from typing import List
+from typing_extensions import TypedDict
+import asyncio
+import logging
+import os
 from createadmin import create_default_admins
-from database import db
-from auth import hash_password, verify_password
+from sequences import next_membership_no
+from indexes import ensure_indexes
+from database import connect, db, run_db
+from pymongo import ReturnDocument
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from auth import (
+    LOGIN_MAX_FAILURES_PER_IP, LOGIN_MAX_FAILURES_PER_USER, PasswordHashingBusy,
+    client_ip, hash_password_async, login_throttle, verify_password_async,
+)
 from jose import jwt
 from datetime import datetime, timedelta
 from fastapi import APIRouter, HTTPException, Form
-# ===================== REPORTLAB =====================
-from reportlab.lib.pagesizes import A7, landscape
-from reportlab.lib.colors import HexColor
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-from reportlab.lib.utils import ImageReader
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+from cardcache import CARD_PROJECTION, IDCARD_LAYOUT, card_key, idcard_cache
+from candidates import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SORT_KEYS, MemberPage, EXPORT_FORMATS as MEMBER_EXPORT_FORMATS,
+    apply_cursor, build_query, count_candidates, find_page, next_cursor, normalize_mobile,
+    parse_columns, stream_csv, stream_ndjson, stream_xlsx,
+)
+from streaming import accepts_gzip, gzip_chunks
+from serialization import json_response
+from exports import (
+    EXPORT_FORMATS, EXPORT_ZIP_VOLUME_CARDS, acknowledge, build_filter, create_job, export_jobs, finish,
+    public_job, remaining, render_pdf_volume, served, stream_zip,
+)
+from photostore import UPLOAD_DIR, PhotoStaticFiles, store_upload, load_photo_bytes
+from imaging import PhotoRejected
+from workers import run_cpu, shutdown_process_pool
+from sessions import ADMIN_VERSION_PROJECTION, admin_cache
+from refdata import bump_version, reference_caches, seed_district_secretaries
+from stats import DIMENSIONS, read_stats, reconcile_periodically, record_members
+from startup import WARMUP_IDCARD, startup_report
+from importer import ImportRejected, import_members, open_photo_zip, read_rows
+from uploads import UploadLimitMiddleware
+from metrics import MetricsMiddleware, idcard_pdf_bytes, idcard_render_seconds, registry
+from dedupe import (
+    ALREADY_REGISTERED, REVIEW_STATUSES, check_secret, dedupe_keys, find_matches, list_reviews,
+    queue_matches, record_blocked, resolve_review, strong_match,
+)
+from regqueue import BUFFERED, QueueFull, registration_queue, registration_status
+from search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, name_tokens, search_members
+from verification import (
+    InvalidToken, check_keys, name_matches, public_key_pem, read_token, restore, revocations, revoke,
+)
+
+logger = logging.getLogger(__name__)
+
+STARTUP_RETRY_SECONDS = 5
 
 # ===================== APP =====================
 app = FastAPI()
+startup_report.record("import", time.perf_counter() - _import_started)
+
+
+# Runs in the background so the server accepts connections immediately;
+# /health/ready turns 200 once the database is reachable and seeded.
+async def initialize():
+    while True:
+        try:
+            with startup_report.phase("connect"):
+                await run_db(connect)
+            with startup_report.phase("indexes"):
+                await run_db(ensure_indexes)
+            with startup_report.phase("seed_admins"):
+                await run_db(create_default_admins)
+            with startup_report.phase("seed_reference"):
+                await run_db(seed_district_secretaries)
+            break
+        except Exception as e:
+            startup_report.error = str(e)
+            logger.exception("Startup failed, retrying in %ss", STARTUP_RETRY_SECONDS)
+            await asyncio.sleep(STARTUP_RETRY_SECONDS)
+
+    startup_report.ready = True
+    startup_report.error = None
+    app.state.background.append(asyncio.create_task(reconcile_periodically()))
+
+    if WARMUP_IDCARD:
+        from idcard import render_idcard
+        sample = {"name": "Warmup", "mobile": "0000000000", "district": "", "membership_no": ""}
+        with startup_report.phase("warmup_idcard"):
+            await run_cpu(render_idcard, sample)
+    startup_report.log()
+
+
 @app.on_event("startup")
-def startup_event():
-    create_default_admins()
-pdfmetrics.registerFont(UnicodeCIDFont("HeiseiMin-W3"))
+async def startup_event():
+    check_keys()
+    check_secret()
+    app.state.background = []
+    if BUFFERED:
+        app.state.background += await registration_queue.start()
+    app.state.background.append(asyncio.create_task(initialize()))
+
+@app.on_event("shutdown")
+def shutdown_event():
+    for task in app.state.background:
+        task.cancel()
+    if BUFFERED:
+        registration_queue.close()
+    shutdown_process_pool()
 
 # ===================== CORS =====================
+# added first so CORS headers also land on its 413s
+app.add_middleware(UploadLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -42,11 +129,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# outermost, so its timings include everything below
+app.add_middleware(MetricsMiddleware)
 
 # ===================== DIRECTORIES =====================
 
 
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+app.mount("/uploads", PhotoStaticFiles(directory=UPLOAD_DIR), name="uploads")
 app.mount("/assets", StaticFiles(directory="assets"), name="assets")
 
 # ===================== DATABASE =====================
@@ -60,16 +149,85 @@ app.mount("/assets", StaticFiles(directory="assets"), name="assets")
 # db = client["political_db"]
 candidates_collection = db["candidates"]
 
+# ===================== HEALTH =====================
+@app.get("/health/live")
+async def health_live():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    if not startup_report.ready:
+        return Response(status_code=503, content=b'{"ready":false}', media_type="application/json")
+    return {"ready": True}
+
+
+@app.get("/health/startup")
+async def health_startup():
+    return startup_report.as_dict()
+
+# ===================== METRICS =====================
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+@registry.collector
+def cache_metrics():
+    card = idcard_cache.stats()
+    sessions = admin_cache.stats()
+    requests = [
+        ({"cache": "idcard", "result": "memory_hit"}, card["memory_hits"]),
+        ({"cache": "idcard", "result": "disk_hit"}, card["disk_hits"]),
+        ({"cache": "idcard", "result": "miss"}, card["misses"]),
+        ({"cache": "admin_sessions", "result": "hit"}, sessions["hits"]),
+        ({"cache": "admin_sessions", "result": "miss"}, sessions["misses"]),
+    ]
+    for name, cache in reference_caches.items():
+        ref = cache.stats()
+        requests += [
+            ({"cache": name, "result": "hit"}, ref["hits"]),
+            ({"cache": name, "result": "revalidation"}, ref["revalidations"]),
+            ({"cache": name, "result": "reload"}, ref["reloads"]),
+        ]
+    return [
+        ("cache_requests_total", "counter", "Cache lookups by outcome", requests),
+        ("cache_hit_ratio", "gauge", "Share of lookups served from cache", [
+            ({"cache": "idcard"}, card["hit_ratio"]),
+            ({"cache": "admin_sessions"}, sessions["hit_ratio"]),
+        ]),
+        ("idcard_cache_bytes", "gauge", "Bytes held by the in-memory ID card cache", [({}, card["bytes"])]),
+        ("idcard_disk_cache_bytes", "gauge", "Bytes of ID card PDFs under IDCARD_CACHE_DIR",
+         [({}, card["disk_bytes"])]),
+    ]
+
+
+@registry.collector
+def registration_queue_metrics():
+    if not BUFFERED:
+        return []
+    q = registration_queue.stats()
+    return [
+        ("registration_queue_pending", "gauge", "Buffered registrations not yet in Mongo", [({}, q["pending"])]),
+        ("registration_queue_total", "counter", "Buffered registrations by outcome", [
+            ({"result": result}, q[result]) for result in ("accepted", "confirmed", "rejected")
+        ]),
+        ("registration_queue_flush_errors_total", "counter", "Failed flush attempts", [({}, q["flush_errors"])]),
+    ]
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: str = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # ===================== DISTRICTS =====================
 @app.get("/districts")
-def get_districts():
-    districts = list(db.districts.find({}, {"_id": 0, "name": 1}))
-    return [d["name"] for d in districts]
+async def get_districts(request: Request):
+    return await reference_caches["districts"].response(request)
 
 # ===================== MEMBERSHIP NO =====================
 def generate_membership_no():
-    count = candidates_collection.count_documents({})
-    return f"PBM-{datetime.now().year}-{count + 1:06d}"
+    return next_membership_no()
 
 # ===================== REGISTER =====================
 @app.post("/register")
@@ -93,30 +251,49 @@ async def register(
     aadhaar: str = Form(""),
     photo: UploadFile = File(None)
 ):
-    if candidates_collection.find_one({"mobile": mobile}):
-        raise HTTPException(status_code=400, detail="Mobile number already registered")
-
-    membership_no = generate_membership_no()
+    keys = dedupe_keys({"name": name, "father_name": father_name, "dob": dob,
+                        "voter_id": voter_id, "aadhaar": aadhaar})
+    if BUFFERED:
+        # no database round trip: duplicates are settled by the flusher
+        if registration_queue.full():
+            raise _registration_busy()
+        try:
+            membership_no = await registration_queue.next_membership_no()
+        except Exception:
+            logger.exception("Could not lease membership numbers")
+            raise _registration_busy()
+    else:
+        # voter ID / aadhaar / phonetic name look-up runs alongside the counter
+        membership_no, [matches] = await asyncio.gather(
+            run_db(generate_membership_no), run_db(find_matches, [{"dedupe_keys": keys}])
+        )
+        key, member = strong_match(matches)
+        if key:
+            try:
+                await run_db(record_blocked, key, member, {"mobile": normalize_mobile(mobile), "name": name})
+            except Exception:
+                logger.exception("Could not record blocked registration")
+            raise HTTPException(status_code=400, detail=ALREADY_REGISTERED)
 
-    # ---------- Save photo (Base64) ----------
-    photo_base64 = None
+    # ---------- Save photo ----------
+    photo_urls = {"photo": "", "photo_thumb": ""}
 
     if photo:
-        photo_bytes = await photo.read()
-        photo_base64 = base64.b64encode(photo_bytes).decode("utf-8")
-
-
-
+        try:
+            photo_urls = await store_upload(photo)
+        except PhotoRejected as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
     candidate_doc = {
         "membership_no": membership_no,
         "name": name,
+        "name_tokens": name_tokens(name),
         "father_name": father_name,
         "gender": gender,
         "dob": dob,
         "age": age,
         "blood_group": blood_group,
-        "mobile": mobile,
+        "mobile": normalize_mobile(mobile),
         "email": email,
         "state": state,
         "district": district,
@@ -127,10 +304,43 @@ async def register(
         "address": address,
         "voter_id": voter_id,
         "aadhaar": aadhaar,
-        "photo_base64": photo_base64,    # ✅ ONLY filename
+        "dedupe_keys": keys,
+        **photo_urls,    # ✅ ONLY the photostore URLs
     }
 
-    result = candidates_collection.insert_one(candidate_doc)
+    if BUFFERED:
+        candidate_doc["_id"] = ObjectId()  # fixed now so a journal replay inserts the same document
+        try:
+            await registration_queue.submit(candidate_doc)
+        except QueueFull:
+            raise _registration_busy()
+        return JSONResponse(status_code=202, content={
+            "message": "Registration received",
+            "membership_no": membership_no,
+            "id": str(candidate_doc["_id"]),
+            "status": "pending",
+        })
+
+    # unique index on mobile does the duplicate check in the same round trip
+    try:
+        result = await run_db(candidates_collection.insert_one, candidate_doc)
+    except DuplicateKeyError as e:
+        if "mobile" not in (e.details or {}).get("keyPattern", {"mobile": 1}):
+            raise
+        raise HTTPException(status_code=400, detail="Mobile number already registered")
+
+    try:
+        await run_db(record_members, [candidate_doc])
+    except Exception:
+        # counters are repaired by the next reconciliation pass
+        logger.exception("Could not update membership stats")
+
+    if matches:
+        try:
+            await run_db(queue_matches, candidate_doc, matches)
+        except Exception:
+            # the nightly dedupe.py run finds the pair again
+            logger.exception("Could not queue duplicate review")
 
     return {
         "message": "Registration successful",
@@ -142,26 +352,57 @@ async def register(
 
 
 
+def _registration_busy():
+    return HTTPException(status_code=503, detail="Too many registrations right now, please retry",
+                         headers={"Retry-After": "5"})
+
+
+# pending while still in the buffered queue (REGISTER_MODE=buffered)
+@app.get("/register/status/{membership_no}")
+async def register_status(membership_no: str):
+    if registration_queue.status(membership_no):
+        return {"membership_no": membership_no, "status": "pending"}
+    result = await run_db(registration_status, membership_no)
+    if not result:
+        raise HTTPException(status_code=404, detail="Unknown membership number")
+    return {"membership_no": membership_no, **result}
+
+
+# ===================== VERIFY =====================
+# For offline verifier apps: checks card signatures, cannot create them.
+@app.get("/verify/public-key")
+async def verify_public_key():
+    return Response(public_key_pem(), media_type="application/x-pem-file")
+
+
+# Scanned from the QR code on the ID card. The token carries its own
+# signature, so this never reads the member; only the in-memory
+# revocation set is consulted.
+@app.get("/verify/{token}")
+async def verify_member(token: str, name: str = ""):
+    try:
+        membership_no, valid_until, name_hash = await run_in_threadpool(read_token, token)
+    except InvalidToken as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if valid_until < datetime.now().date():
+        raise HTTPException(status_code=410, detail="Card expired")
+    if await revocations.is_revoked(membership_no):
+        raise HTTPException(status_code=410, detail="Membership revoked")
+
+    result = {
+        "status": "Valid Member",
+        "membership_no": membership_no,
+        "valid_until": valid_until.isoformat(),
+    }
+    if name:
+        result["name_matches"] = name_matches(name_hash, name)
+    return result
+
+
 # ===================== DISTRICT SECRETARIES =====================
 @app.get("/district-secretaries")
-def get_district_secretaries():
-    return [
-        {
-            "name": "திரு. மு. செந்தில்",
-            "district": "சென்னை",
-            "photo": "/assets/district_secretaries/dum.jpeg"
-        },
-        {
-            "name": "திரு. க. ரமேஷ்",
-            "district": "மதுரை",
-            "photo": "/assets/district_secretaries/dum.jpeg"
-        },
-        {
-            "name": "திருமதி. சு. லதா",
-            "district": "கோயம்புத்தூர்",
-            "photo": "/assets/district_secretaries/dum.jpeg"
-        }
-    ]
+async def get_district_secretaries(request: Request):
+    return await reference_caches["district_secretaries"].response(request)
 
 
 
@@ -179,155 +420,418 @@ def create_access_token(data: dict):
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
-def get_current_admin(authorization: str = Header(None)):
+async def get_current_admin(authorization: str = Header(None)):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     token = authorization.replace("Bearer ", "")
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        admin = db.admins.find_one({"username": payload["sub"], "active": True})
-        if not admin:
+        version = payload.get("ver", 0)
+        admin = admin_cache.get(payload["sub"], version)
+        if admin:
+            # another worker may have bumped token_version (password change)
+            # or deactivated the admin; an index-only lookup says so at once
+            current = await run_db(
+                db.admins.find_one, {"username": payload["sub"], "active": True}, ADMIN_VERSION_PROJECTION
+            )
+            if current is not None and current.get("token_version", 0) == version:
+                return admin
+            admin_cache.invalidate(payload["sub"])
             raise Exception()
+
+        admin = await run_db(db.admins.find_one, {"username": payload["sub"], "active": True})
+        if not admin or admin.get("token_version", 0) != version:
+            raise Exception()
+        admin_cache.put(admin)
         return admin
     except:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
+def _throttled(retry_after):
+    return HTTPException(
+        status_code=429,
+        detail="Too many failed login attempts, try again later",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
 @router.post("/login")
-def admin_login(username: str = Form(...), password: str = Form(...)):
-    admin = db.admins.find_one({"username": username, "active": True})
-    if not admin or not verify_password(password, admin["password"]):
+async def admin_login(request: Request, username: str = Form(...), password: str = Form(...)):
+    user_key = f"user:{username}"
+    ip = client_ip(request)
+    # unknown client behind the proxy: the per-username limit still applies
+    ip_key = f"ip:{ip}" if ip else None
+    retry_after = max(
+        login_throttle.retry_after(user_key, LOGIN_MAX_FAILURES_PER_USER),
+        login_throttle.retry_after(ip_key, LOGIN_MAX_FAILURES_PER_IP) if ip_key else 0,
+    )
+    if retry_after:
+        raise _throttled(retry_after)
+
+    admin = await run_db(db.admins.find_one, {"username": username, "active": True})
+    try:
+        valid = bool(admin) and await verify_password_async(password, admin["password"])
+    except PasswordHashingBusy:
+        raise HTTPException(status_code=503, detail="Server busy, try again", headers={"Retry-After": "1"})
+
+    if not valid:
+        login_throttle.failed(user_key)
+        if ip_key:
+            login_throttle.failed(ip_key)
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    login_throttle.reset(user_key)
 
     token = create_access_token({
         "sub": admin["username"],
-        "role": admin["role"]
+        "role": admin["role"],
+        "ver": admin.get("token_version", 0)
     })
 
     return {"access_token": token, "token_type": "bearer"}
 
 
 @router.get("/dashboard")
-def admin_dashboard(admin=Depends(get_current_admin)):
-    return {"message": f"Welcome {admin['username']}"}
+async def admin_dashboard(admin=Depends(get_current_admin)):
+    stats = await run_db(read_stats, "total")
+    return {
+        "message": f"Welcome {admin['username']}",
+        "total_members": stats.get("total", {}).get("all", 0),
+    }
 
 
-@router.post("/change-password")
-def change_password(old_password: str = Form(...), new_password: str = Form(...),
-                    admin=Depends(get_current_admin)):
-    if not verify_password(old_password, admin["password"]):
-        raise HTTPException(status_code=400, detail="Old password incorrect")
+# ===================== STATS =====================
+@router.get("/stats")
+async def membership_statistics(admin=Depends(get_current_admin)):
+    stats = await run_db(read_stats)
+    return {"total": stats.pop("total", {}).get("all", 0), **stats}
+
 
-    db.admins.update_one(
+@router.get("/stats/{dimension}")
+async def membership_statistics_by(dimension: str, admin=Depends(get_current_admin)):
+    if dimension not in DIMENSIONS:
+        raise HTTPException(status_code=404, detail="Unknown statistic")
+    stats = await run_db(read_stats, dimension)
+    return stats.get(dimension, {})
+
+
+@router.post("/change-password")
+async def change_password(old_password: str = Form(...), new_password: str = Form(...),
+                          admin=Depends(get_current_admin)):
+    try:
+        if not await verify_password_async(old_password, admin["password"]):
+            raise HTTPException(status_code=400, detail="Old password incorrect")
+        hashed = await hash_password_async(new_password)
+    except PasswordHashingBusy:
+        raise HTTPException(status_code=503, detail="Server busy, try again", headers={"Retry-After": "1"})
+    # bumping token_version revokes every token issued with the old password
+    updated = await run_db(
+        db.admins.find_one_and_update,
         {"_id": admin["_id"]},
-        {"$set": {"password": hash_password(new_password)}}
+        {"$set": {"password": hashed}, "$inc": {"token_version": 1}},
+        return_document=ReturnDocument.AFTER,
     )
-    return {"message": "Password updated successfully"}
+    admin_cache.invalidate(admin["username"])
+
+    token = create_access_token({
+        "sub": updated["username"],
+        "role": updated["role"],
+        "ver": updated["token_version"]
+    })
+    return {"message": "Password updated successfully", "access_token": token, "token_type": "bearer"}
 
 
 @router.post("/reset-password")
-def reset_admin_password(username: str = Form(...), new_password: str = Form(...),
-                         admin=Depends(get_current_admin)):
+async def reset_admin_password(username: str = Form(...), new_password: str = Form(...),
+                               admin=Depends(get_current_admin)):
     if admin["role"] != "superadmin":
         raise HTTPException(status_code=403, detail="Access denied")
 
-    db.admins.update_one(
+    try:
+        hashed = await hash_password_async(new_password)
+    except PasswordHashingBusy:
+        raise HTTPException(status_code=503, detail="Server busy, try again", headers={"Retry-After": "1"})
+    await run_db(
+        db.admins.update_one,
         {"username": username},
-        {"$set": {"password": hash_password(new_password)}}
+        {"$set": {"password": hashed}, "$inc": {"token_version": 1}}
     )
+    admin_cache.invalidate(username)
     return {"message": f"Password reset for {username}"}
 
 
-@router.get("/candidates")
-def get_all_candidates(admin=Depends(get_current_admin)):
-    candidates = list(
-        candidates_collection.find(
-            {}, {"_id": 1, "name": 1, "mobile": 1, "district": 1, "gender": 1, "age": 1}
+@router.get("/candidates", response_model=None, responses={200: {"model": MemberPage}})
+async def get_all_candidates(
+    request: Request,
+    limit: int = Query(None, ge=1),
+    after: str = "",
+    sort: str = "_id",
+    district: str = "",
+    gender: str = "",
+    constituency: str = "",
+    min_age: int = Query(None, ge=0),
+    max_age: int = Query(None, ge=0),
+    total: bool = False,
+    format: str = "json",
+    admin=Depends(get_current_admin),
+):
+    if sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail="sort must be _id or membership_no")
+
+    query = build_query(district, gender, constituency, min_age, max_age)
+    try:
+        page_query = apply_cursor(query, sort, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # NDJSON streams everything after the cursor unless a limit is given
+    if format == "ndjson":
+        return StreamingResponse(stream_ndjson(page_query, sort, limit), media_type="application/x-ndjson")
+
+    limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    rows = await run_db(find_page, page_query, sort, limit)
+    page = {"items": rows, "next": next_cursor(rows, sort, limit)}
+    if total:
+        page["total"] = await run_db(count_candidates, query)
+    return json_response(request, page)
+
+
+# Typeahead over mobile / membership_no prefixes, voter ID and name tokens;
+# what the query looks like decides which index is used.
+@router.get("/candidates/search")
+async def search_candidates(
+    q: str,
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1),
+    after: str = "",
+    district: str = "",
+    admin=Depends(get_current_admin),
+):
+    kind, rows, cursor = await run_db(search_members, q, min(limit, MAX_SEARCH_LIMIT), after, district)
+    if kind is None:
+        raise HTTPException(status_code=400, detail="Search term too short")
+    return {"match": kind, "items": rows, "next": cursor}
+
+
+@router.get("/candidates/export")
+async def export_candidates(
+    request: Request,
+    format: str = "csv",
+    columns: str = "",
+    district: str = "",
+    gender: str = "",
+    constituency: str = "",
+    min_age: int = Query(None, ge=0),
+    max_age: int = Query(None, ge=0),
+    admin=Depends(get_current_admin),
+):
+    if format not in MEMBER_EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or xlsx")
+    try:
+        selected = parse_columns(columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    query = build_query(district, gender, constituency, min_age, max_age)
+    filename = f"members-{datetime.now():%Y%m%d-%H%M}.{format}"
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+
+    if format == "xlsx":
+        # already deflate-compressed inside the zip container
+        return StreamingResponse(
+            stream_xlsx(query, selected),
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers=headers,
         )
-    )
-    for c in candidates:
-        c["_id"] = str(c["_id"])
-    return candidates
+
+    body = stream_csv(query, selected)
+    if accepts_gzip(request):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(body, media_type="text/csv; charset=utf-8", headers=headers)
+
+
+@router.post("/candidates/import")
+async def import_candidates(
+    file: UploadFile = File(...),
+    photos: UploadFile = File(None),
+    admin=Depends(get_current_admin),
+):
+    try:
+        rows = await run_in_threadpool(read_rows, file.file, file.filename)
+        photos_zip = await run_in_threadpool(open_photo_zip, photos.file) if photos else None
+    except ImportRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    started = time.perf_counter()
+    report = await import_members(rows, photos_zip)
+    logger.info("Import by %s: %d inserted, %d failed in %.1fs", admin["username"],
+                report["inserted"], report["failed"], time.perf_counter() - started)
+    return report
 
 
-@router.get("/list")
-def list_admins(admin=Depends(get_current_admin)):
+class AdminRow(TypedDict, total=False):
+    username: str
+    role: str
+    active: bool
+
+
+@router.get("/list", response_model=None, responses={200: {"model": List[AdminRow]}})
+async def list_admins(request: Request, admin=Depends(get_current_admin)):
     if admin["role"] != "superadmin":
         raise HTTPException(status_code=403)
 
-    return list(db.admins.find({}, {"_id": 0, "username": 1, "role": 1, "active": 1}))
+    admins = await run_db(lambda: list(db.admins.find({}, {"_id": 0, "username": 1, "role": 1, "active": 1})))
+    return json_response(request, admins)
 # ===================== ID CARD PDF =====================
 @router.get("/idcard/{mobile}")
-def generate_idcard(mobile: str, admin=Depends(get_current_admin)):
-    cnd = candidates_collection.find_one({"mobile": mobile})
+async def generate_idcard(mobile: str, request: Request, admin=Depends(get_current_admin)):
+    cnd = await run_db(candidates_collection.find_one, {"mobile": normalize_mobile(mobile)}, CARD_PROJECTION)
     if not cnd:
         raise HTTPException(status_code=404, detail="Member not found")
 
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=landscape(A7))
-    width, height = landscape(A7)
-
-    bar_width = 10 * mm
-
-    # Background
-    c.setFillColor(HexColor("#1B5E20"))
-    c.rect(0, 0, bar_width, height, fill=1, stroke=0)
-    c.rect(width - bar_width, 0, bar_width, height, fill=1, stroke=0)
-
-    c.setFillColor(HexColor("#E8F5E9"))
-    c.rect(bar_width, 0, width - 2 * bar_width, height, fill=1, stroke=0)
-
-    # Party name
-    c.setFont("Helvetica-Bold", 12)
-    c.setFillColor(HexColor("#1B5E20"))
-    c.drawCentredString(width / 2, height - 10 * mm, "PASUMAI BHARAT MAKKAL KATCHI")
-
-    # Photo
-    photo_radius = 15 * mm
-    photo_x = bar_width + 20 * mm
-    photo_y = height / 2
-
-    photo_base64 = cnd.get("photo_base64")
-
-    if photo_base64:
-      image_bytes = base64.b64decode(photo_base64)
-      image = ImageReader(io.BytesIO(image_bytes))
-
-      c.drawImage(
-          image,
-          photo_x - photo_radius,
-          photo_y - photo_radius,
-          2 * photo_radius,
-          2 * photo_radius,
-          mask="auto",
-          preserveAspectRatio=True
-      )
-    
-
-    # draw border last
-    c.setStrokeColor(HexColor("#1B5E20"))
-    c.setLineWidth(1)
-    c.circle(photo_x, photo_y, photo_radius, fill=0)
-
-    # Text
-    c.setFont("Helvetica-Bold", 9)
-    tx = photo_x + photo_radius + 7 * mm
-    ty = photo_y + 15 * mm
-    gap = 12
-
-    c.drawString(tx, ty, cnd["name"].upper())
-    c.drawString(tx, ty - gap, f"Mobile: {cnd['mobile']}")
-    c.drawString(tx, ty - 2 * gap, f"District: {cnd['district']}")
-    c.drawString(tx, ty - 3 * gap, f"ID: {cnd['membership_no']}")
-
-    c.save()
-    buffer.seek(0)
-
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": "inline; filename=idcard.pdf"},
-    )
+    etag = f'"{await run_in_threadpool(card_key, cnd)}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": "inline; filename=idcard.pdf",
+    }
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    pdf = await run_in_threadpool(idcard_cache.get, etag.strip('"'))
+    if pdf is None:
+        photo_bytes = await run_in_threadpool(load_photo_bytes, cnd)
+        # ReportLab is CPU-bound; keep it off the event loop too
+        from idcard import render_idcard  # ReportLab stays out of app import
+        started = time.perf_counter()
+        pdf = await run_cpu(render_idcard, cnd, photo_bytes)
+        idcard_render_seconds.observe(time.perf_counter() - started, IDCARD_LAYOUT)
+        idcard_pdf_bytes.observe(len(pdf), IDCARD_LAYOUT)
+        await run_in_threadpool(idcard_cache.put, etag.strip('"'), pdf)
+
+    return Response(pdf, media_type="application/pdf", headers=headers)
+
+
+# ===================== BULK ID CARD EXPORT =====================
+@router.get("/idcards/export")
+async def export_idcards(
+    format: str = "zip",
+    district: str = "",
+    constituency: str = "",
+    ward: str = "",
+    from_no: str = "",
+    to_no: str = "",
+    job_id: str = "",
+    received: int = 0,
+    admin=Depends(get_current_admin),
+):
+    # received: the X-Export-Volume the client got in full; the job only
+    # moves past a volume once it is confirmed this way
+    if job_id:
+        job = await run_db(export_jobs.find_one, {"_id": job_id})
+        if not job:
+            raise HTTPException(status_code=404, detail="Export job not found")
+        if received:
+            job = await run_db(acknowledge, job, received)
+        if job["status"] == "done":
+            if received:
+                return Response(status_code=204, headers={"X-Export-Job": job["_id"]})
+            raise HTTPException(status_code=410, detail="Export job already finished")
+    else:
+        if format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail="format must be zip or pdf")
+        query = build_filter(district, constituency, ward, from_no, to_no)
+        job = await run_db(create_job, query, format, admin["username"])
+
+    volume = job.get("volume", 0) + 1
+    headers = {"X-Export-Job": job["_id"], "X-Export-Volume": str(volume)}
+
+    if job["format"] == "zip":
+        left = await run_db(remaining, job, EXPORT_ZIP_VOLUME_CARDS + 1)
+        if not left:
+            await run_db(finish, job)
+            return Response(status_code=204, headers=headers)
+        headers["X-Export-Done"] = "1" if left <= EXPORT_ZIP_VOLUME_CARDS else "0"
+        headers["Content-Disposition"] = f"attachment; filename=idcards-{job['_id']}-{volume:03d}.zip"
+        return StreamingResponse(stream_zip(job, left <= EXPORT_ZIP_VOLUME_CARDS),
+                                 media_type="application/zip", headers=headers)
+
+    pdf, last_id, count, done = await render_pdf_volume(job)
+    if pdf is None:
+        await run_db(finish, job)
+        return Response(status_code=204, headers=headers)
+    await run_db(served, job, last_id, count, done)
+
+    headers["X-Export-Done"] = "1" if done else "0"
+    headers["Content-Disposition"] = f"attachment; filename=idcards-{job['_id']}-{job['exported']:06d}.pdf"
+    return Response(pdf, media_type="application/pdf", headers=headers)
+
+
+@router.get("/idcards/export/{job_id}")
+async def export_job_status(job_id: str, admin=Depends(get_current_admin)):
+    job = await run_db(export_jobs.find_one, {"_id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return public_job(job)
+
+
+@router.post("/reference/{name}/refresh")
+async def refresh_reference_data(name: str, admin=Depends(get_current_admin)):
+    if name not in reference_caches:
+        raise HTTPException(status_code=404, detail="Unknown reference data")
+    await run_db(bump_version, name)
+    reference_caches[name].invalidate()
+    return {"message": f"{name} will be reloaded"}
+
+
+@router.post("/revocations")
+async def revoke_member(membership_no: str = Form(...), reason: str = Form(""),
+                        admin=Depends(get_current_admin)):
+    await run_db(revoke, membership_no, reason, admin["username"])
+    revocations.invalidate()
+    return {"message": f"{membership_no} revoked"}
+
+
+@router.delete("/revocations/{membership_no}")
+async def restore_member(membership_no: str, admin=Depends(get_current_admin)):
+    if not await run_db(restore, membership_no):
+        raise HTTPException(status_code=404, detail="Not revoked")
+    revocations.invalidate()
+    return {"message": f"{membership_no} restored"}
+
+
+# ===================== DUPLICATE REVIEW =====================
+@router.get("/dedupe/reviews")
+async def get_dedupe_reviews(
+    status: str = "open",
+    limit: int = Query(100, ge=1, le=1000),
+    after: str = "",
+    admin=Depends(get_current_admin),
+):
+    if status not in REVIEW_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(REVIEW_STATUSES)}")
+    items = await run_db(list_reviews, status, limit, after)
+    return {"items": items, "next": items[-1]["_id"] if len(items) == limit else None}
+
+
+@router.post("/dedupe/reviews/{review_id}")
+async def resolve_dedupe_review(review_id: str, status: str = Form(...), admin=Depends(get_current_admin)):
+    if status not in REVIEW_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(REVIEW_STATUSES)}")
+    if not await run_db(resolve_review, review_id, status, admin["username"]):
+        raise HTTPException(status_code=404, detail="Review not found")
+    return {"message": f"Marked {status}"}
+
+
+@router.get("/cache/stats")
+async def cache_stats(admin=Depends(get_current_admin)):
+    return {
+        "idcard": idcard_cache.stats(),
+        "admin_sessions": admin_cache.stats(),
+        "reference": {name: cache.stats() for name, cache in reference_caches.items()},
+        "revocations": revocations.stats(),
+    }
 
-app.include_router(router)
\ No newline at end of file
+app.include_router(router)
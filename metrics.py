@@ -0,0 +1,278 @@
+# metrics.py
+from collections import deque
+from pymongo import monitoring
+from starlette.concurrency import run_in_threadpool
+import bisect
+import os
+import re
+import sys
+import threading
+import time
+
+# ===================== PRIMITIVES =====================
+# Just enough of the Prometheus data model to expose /metrics in the text
+# format without another dependency. Every worker process keeps its own
+# numbers; scrape each one (or sum them in the query).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(8))  # 1 KB .. 16 MB
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _labels(self.label_names, k), v) for k, v in self._values.items()]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, labels
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            v = self._values.get(labels)
+            if v is None:
+                v = self._values[labels] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                v[i] += 1
+            v[-2] += value
+            v[-1] += 1
+
+    def samples(self):
+        out = []
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for labels, v in items:
+            cumulative = 0
+            for le, n in zip(self.buckets, v):
+                cumulative += n
+                out.append((f"{self.name}_bucket", _labels(self.label_names + ("le",), labels + (le,)), cumulative))
+            out.append((f"{self.name}_bucket", _labels(self.label_names + ("le",), labels + ("+Inf",)), v[-1]))
+            out.append((f"{self.name}_sum", _labels(self.label_names, labels), v[-2]))
+            out.append((f"{self.name}_count", _labels(self.label_names, labels), v[-1]))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    # fn() -> [(name, kind, help, [(label dict, value)])], read at scrape time
+    def collector(self, fn):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for m in self._metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(f"{name}{labels} {value}" for name, labels, value in m.samples())
+        for fn in self._collectors:
+            for name, kind, help, samples in fn():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ===================== METRICS =====================
+
+http_request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by route template",
+    ("method", "route", "status")))
+mongo_command_seconds = registry.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command round trip",
+    ("collection", "command")))
+mongo_command_failures = registry.register(Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands",
+    ("collection", "command")))
+idcard_render_seconds = registry.register(Histogram(
+    "idcard_render_duration_seconds", "ID card PDF render time, pool queueing included",
+    ("layout",)))
+idcard_pdf_bytes = registry.register(Histogram(
+    "idcard_pdf_bytes", "Rendered ID card PDF size", ("layout",), buckets=BYTES_BUCKETS))
+photo_upload_bytes = registry.register(Histogram(
+    "photo_upload_bytes", "Accepted photo upload size", buckets=BYTES_BUCKETS))
+password_hash_seconds = registry.register(Histogram(
+    "password_hash_duration_seconds", "bcrypt time including pool wait", ("op",)))
+
+
+# ===================== MONGO COMMAND MONITORING =====================
+# Passed to MongoClient(event_listeners=...). Succeeded/failed events
+# don't carry the collection, so it is remembered from the started event.
+
+_MONGO_SKIP = {"isMaster", "ismaster", "hello", "ping", "saslStart", "saslContinue", "endSessions"}
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def __init__(self):
+        self._pending = {}
+
+    def _key(self, event):
+        return event.connection_id, event.request_id
+
+    def started(self, event):
+        if event.command_name in _MONGO_SKIP:
+            return
+        target = event.command.get(event.command_name)
+        if not isinstance(target, str):
+            # getMore carries the cursor id there, the collection separately
+            target = event.command.get("collection")
+        collection = target if isinstance(target, str) else event.database_name
+        if len(self._pending) > 10000:  # events lost to a dropped connection
+            self._pending.clear()
+        self._pending[self._key(event)] = (collection, event.command_name)
+
+    def succeeded(self, event):
+        labels = self._pending.pop(self._key(event), None)
+        if labels:
+            mongo_command_seconds.observe(event.duration_micros / 1e6, *labels)
+
+    def failed(self, event):
+        labels = self._pending.pop(self._key(event), None)
+        if labels:
+            mongo_command_seconds.observe(event.duration_micros / 1e6, *labels)
+            mongo_command_failures.inc(*labels)
+
+
+mongo_listener = MongoCommandListener()
+
+
+# ===================== SLOW REQUEST PROFILER =====================
+# Opt-in (PROFILE_SLOW_REQUESTS_MS > 0). While requests are in flight a
+# thread samples every thread's stack; when a request ends slower than the
+# threshold, the samples taken during it are written to PROFILE_DIR as
+# collapsed stacks (flamegraph.pl / speedscope input). Samples from other
+# requests running at the same time land in the same file.
+
+PROFILE_SLOW_REQUESTS_MS = int(os.getenv("PROFILE_SLOW_REQUESTS_MS", "0"))
+PROFILE_INTERVAL_MS = int(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "profiles"))
+PROFILE_BUFFER_SAMPLES = 20000
+
+
+class SlowRequestProfiler:
+    def __init__(self, threshold_ms, interval_ms, out_dir):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.out_dir = out_dir
+        self._samples = deque(maxlen=PROFILE_BUFFER_SAMPLES)  # (time, stack)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _collapse(self, frame, thread_name):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        stack.append(thread_name)
+        return ";".join(reversed(stack))
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            names = {t.ident: t.name for t in threading.enumerate()}
+            now = time.monotonic()
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    self._samples.append((now, self._collapse(frame, names.get(ident, "thread"))))
+
+    def start(self):
+        with self._lock:
+            self._active += 1
+            if self._thread is None:
+                os.makedirs(self.out_dir, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        return time.monotonic()
+
+    def finish(self, started, label):
+        with self._lock:
+            self._active -= 1
+        elapsed = time.monotonic() - started
+        if elapsed < self.threshold:
+            return None
+
+        counts = {}
+        for at, stack in list(self._samples):
+            if at >= started:
+                counts[stack] = counts.get(stack, 0) + 1
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')}.folded"
+        path = os.path.join(self.out_dir, name)
+        with open(path, "w") as f:
+            f.writelines(f"{stack} {n}\n" for stack, n in counts.items())
+        return path
+
+
+profiler = (SlowRequestProfiler(PROFILE_SLOW_REQUESTS_MS, PROFILE_INTERVAL_MS, PROFILE_DIR)
+            if PROFILE_SLOW_REQUESTS_MS > 0 else None)
+
+
+# ===================== HTTP MIDDLEWARE =====================
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        profile_started = profiler.start() if profiler else None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # the router fills in scope["route"] (templates like
+            # /admin/idcard/{mobile}) and root_path for mounted apps
+            route = scope.get("route")
+            label = getattr(route, "path", None) or scope.get("root_path") or "unmatched"
+            http_request_seconds.observe(time.perf_counter() - started, scope["method"], label, status)
+            if profiler:
+                await run_in_threadpool(profiler.finish, profile_started, f"{scope['method']} {label}")
@@ -0,0 +1,171 @@
+# migrate.py
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timedelta
+import importlib
+import logging
+import os
+import re
+import socket
+import sys
+import time
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+migrations_collection = db["migrations"]
+
+# ===================== CONFIG =====================
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "500"))
+# Pause after every batch, as a multiple of the time the batch took:
+# 1.0 keeps the migration to ~50% of one connection's time.
+MIGRATION_THROTTLE = float(os.getenv("MIGRATION_THROTTLE", "1.0"))
+MIGRATION_LEASE_SECONDS = int(os.getenv("MIGRATION_LEASE_SECONDS", "300"))
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_NAME = re.compile(r"^(\d{4})_\w+\.py$")
+
+
+# ===================== DISCOVERY =====================
+# Every migrations/NNNN_name.py is one migration, applied in NNNN order.
+# A migration module defines:
+#   COLLECTION  collection to walk (default "candidates")
+#   QUERY       filter selecting documents that still need the change
+#   PROJECTION  fields migrate() needs
+#   migrate(docs) -> list of pymongo write ops for one batch
+# Ops must be safe to replay: after a crash the last batch runs again.
+
+def discover():
+    names = sorted(f[:-3] for f in os.listdir(MIGRATIONS_DIR) if _NAME.match(f))
+    return [(name, importlib.import_module(f"migrations.{name}")) for name in names]
+
+
+def applied():
+    return {m["_id"] for m in migrations_collection.find({"status": "applied"}, {"_id": 1})}
+
+
+def pending():
+    done = applied()
+    return [(name, module) for name, module in discover() if name not in done]
+
+
+# ===================== LEASE / CHECKPOINT =====================
+# The migration's own record doubles as a lock, so two runners (or two
+# deploys) never walk the same collection at once.
+
+_owner = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _acquire(name):
+    now = datetime.utcnow()
+    migrations_collection.update_one(
+        {"_id": name},
+        {"$setOnInsert": {"status": "pending", "last_id": None, "processed": 0,
+                          "modified": 0, "errors": 0}},
+        upsert=True,
+    )
+    return migrations_collection.find_one_and_update(
+        {"_id": name, "status": {"$ne": "applied"},
+         "$or": [{"owner": None}, {"owner": _owner}, {"lease_until": {"$lt": now}}]},
+        {"$set": {"status": "running", "owner": _owner,
+                  "lease_until": now + timedelta(seconds=MIGRATION_LEASE_SECONDS)},
+         "$min": {"started_at": now}},
+    )
+
+
+def _checkpoint(name, last_id, processed, modified, errors):
+    migrations_collection.update_one(
+        {"_id": name, "owner": _owner},
+        {"$set": {"last_id": last_id,
+                  "lease_until": datetime.utcnow() + timedelta(seconds=MIGRATION_LEASE_SECONDS)},
+         "$inc": {"processed": processed, "modified": modified, "errors": errors}},
+    )
+
+
+def _finish(name):
+    migrations_collection.update_one(
+        {"_id": name, "owner": _owner},
+        {"$set": {"status": "applied", "finished_at": datetime.utcnow(), "owner": None}},
+    )
+
+
+def _release(name):
+    migrations_collection.update_one({"_id": name, "owner": _owner}, {"$set": {"owner": None}})
+
+
+# ===================== RUNNER =====================
+
+def _write(collection, ops):
+    if not ops:
+        return 0, 0
+    try:
+        result = collection.bulk_write(ops, ordered=False)
+        return result.modified_count + result.upserted_count, 0
+    except BulkWriteError as e:
+        # e.g. two mobiles that normalize to the same number; the rest of
+        # the batch still went through
+        for err in e.details["writeErrors"][:5]:
+            logger.warning("Migration write failed: %s", err.get("errmsg"))
+        return e.details.get("nModified", 0) + e.details.get("nUpserted", 0), len(e.details["writeErrors"])
+
+
+def run_migration(name, module, batch_size=MIGRATION_BATCH_SIZE, throttle=MIGRATION_THROTTLE):
+    state = _acquire(name)
+    if not state:
+        raise RuntimeError(f"Migration {name} is already running elsewhere")
+
+    collection = db[getattr(module, "COLLECTION", "candidates")]
+    query = getattr(module, "QUERY", {})
+    projection = getattr(module, "PROJECTION", None)
+    last_id = state.get("last_id")
+    if last_id is not None:
+        logger.info("Resuming %s after _id %s", name, last_id)
+
+    try:
+        while True:
+            started = time.perf_counter()
+            batch_query = {**query, "_id": {"$gt": last_id}} if last_id is not None else query
+            docs = list(collection.find(batch_query, projection).sort("_id", 1).limit(batch_size))
+            if not docs:
+                break
+
+            modified, errors = _write(collection, module.migrate(docs))
+            last_id = docs[-1]["_id"]
+            _checkpoint(name, last_id, len(docs), modified, errors)
+
+            if throttle > 0:
+                time.sleep((time.perf_counter() - started) * throttle)
+    except BaseException:
+        _release(name)
+        raise
+
+    _finish(name)
+    return migrations_collection.find_one({"_id": name})
+
+
+def run_pending(**kwargs):
+    results = []
+    for name, module in pending():
+        logger.info("Applying migration %s", name)
+        results.append(run_migration(name, module, **kwargs))
+    return results
+
+
+def status():
+    records = {m["_id"]: m for m in migrations_collection.find()}
+    return [
+        {"name": name, **{k: v for k, v in records.get(name, {"status": "pending"}).items() if k != "_id"}}
+        for name, _ in discover()
+    ]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if "--status" in sys.argv:
+        for m in status():
+            print(f"{m['name']:<40} {m['status']:<8} processed={m.get('processed', 0)} "
+                  f"modified={m.get('modified', 0)} errors={m.get('errors', 0)}")
+    else:
+        for m in run_pending():
+            print(f"✅ {m['_id']}: processed {m['processed']}, modified {m['modified']}, errors {m['errors']}")
+        print("✅ Migrations up to date")
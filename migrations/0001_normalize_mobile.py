@@ -0,0 +1,16 @@
+# Store mobiles as bare 10-digit strings (was: one.py fix_old_candidates).
+from pymongo import UpdateOne
+
+from candidates import normalize_mobile
+
+QUERY = {}
+PROJECTION = {"mobile": 1}
+
+
+def migrate(docs):
+    ops = []
+    for c in docs:
+        mobile = normalize_mobile(c.get("mobile"))
+        if mobile != c.get("mobile"):
+            ops.append(UpdateOne({"_id": c["_id"], "mobile": c.get("mobile")}, {"$set": {"mobile": mobile}}))
+    return ops
@@ -0,0 +1,25 @@
+# Give members registered before membership numbers existed one (was:
+# one.py fix_membership_numbers). Numbers come from the same counter as
+# live registrations, so the two can't collide; the year is the one the
+# member registered in.
+from pymongo import UpdateOne
+from collections import defaultdict
+
+from sequences import allocate_membership_nos
+
+QUERY = {"membership_no": {"$exists": False}}
+PROJECTION = {"_id": 1}
+
+
+def migrate(docs):
+    by_year = defaultdict(list)
+    for c in docs:
+        by_year[c["_id"].generation_time.year].append(c["_id"])
+
+    ops = []
+    for year, ids in by_year.items():
+        for _id, number in zip(ids, allocate_membership_nos(len(ids), year)):
+            # a replayed batch skips members numbered the first time round
+            ops.append(UpdateOne({"_id": _id, "membership_no": {"$exists": False}},
+                                 {"$set": {"membership_no": number}}))
+    return ops
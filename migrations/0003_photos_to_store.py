@@ -0,0 +1,22 @@
+# Move legacy photo_base64 blobs into the content-addressed photo store.
+from pymongo import UpdateOne
+import base64
+
+from photostore import save_photo
+
+QUERY = {"photo_base64": {"$exists": True}}
+PROJECTION = {"photo_base64": 1}
+
+
+def migrate(docs):
+    ops = []
+    for c in docs:
+        update = {"$unset": {"photo_base64": ""}}
+        if c.get("photo_base64"):
+            try:
+                update["$set"] = save_photo(base64.b64decode(c["photo_base64"]))
+            except ValueError:  # PhotoRejected or broken base64
+                # keep the bytes for a human to look at, out of the hot path
+                update = {"$rename": {"photo_base64": "photo_base64_rejected"}}
+        ops.append(UpdateOne({"_id": c["_id"]}, update))
+    return ops
@@ -0,0 +1,17 @@
+# Backfill name_tokens for /admin/candidates/search on members registered
+# before it existed.
+from pymongo import UpdateOne
+
+from search import name_tokens
+
+QUERY = {}
+PROJECTION = {"name": 1, "name_tokens": 1}
+
+
+def migrate(docs):
+    ops = []
+    for c in docs:
+        tokens = name_tokens(c.get("name"))
+        if tokens != c.get("name_tokens"):
+            ops.append(UpdateOne({"_id": c["_id"]}, {"$set": {"name_tokens": tokens}}))
+    return ops
@@ -0,0 +1,17 @@
+# Compute dedupe.py blocking keys for existing members. Run
+# `python dedupe.py` afterwards to cluster them into the review queue.
+from pymongo import UpdateOne
+
+from dedupe import dedupe_keys
+
+QUERY = {}
+PROJECTION = {"name": 1, "father_name": 1, "dob": 1, "voter_id": 1, "aadhaar": 1, "dedupe_keys": 1}
+
+
+def migrate(docs):
+    ops = []
+    for c in docs:
+        keys = dedupe_keys(c)
+        if keys != c.get("dedupe_keys"):
+            ops.append(UpdateOne({"_id": c["_id"]}, {"$set": {"dedupe_keys": keys}}))
+    return ops
@@ -0,0 +1,151 @@
+# photostore.py
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+import base64
+import hashlib
+import os
+import tempfile
+
+from imaging import (
+    PhotoRejected, check_content_type, check_photo, check_size,
+    make_derivatives, make_derivatives_from_file,
+)
+from metrics import photo_upload_bytes
+from workers import run_cpu
+
+# ===================== DIRECTORIES =====================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
+PHOTO_DIR = os.path.join(UPLOAD_DIR, "photos")
+PHOTO_URL_PREFIX = "/uploads/photos/"
+# Incoming uploads are spooled here (outside the statically served tree)
+SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(BASE_DIR, "cache", "uploads"))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+os.makedirs(PHOTO_DIR, exist_ok=True)
+os.makedirs(SPOOL_DIR, exist_ok=True)
+
+# ===================== CONTENT-ADDRESSED STORE =====================
+# Uploads are normalized (imaging.make_derivatives) and only the derivatives
+# are kept, at uploads/photos/<sha[:2]>/<sha256>_<size>.jpg where sha256 is
+# of the original upload. Candidates keep the URLs in "photo" (card size)
+# and "photo_thumb". Identical uploads map to the same files and skip the
+# pipeline entirely.
+
+def photo_path(url):
+    if not url or not url.startswith(PHOTO_URL_PREFIX):
+        return None
+    path = os.path.normpath(os.path.join(PHOTO_DIR, url[len(PHOTO_URL_PREFIX):]))
+    if not path.startswith(PHOTO_DIR + os.sep):
+        return None
+    return path
+
+
+def _name(digest, size):
+    return f"{digest[:2]}/{digest}_{size}.jpg"
+
+
+def _photo_urls(digest):
+    return {
+        "photo": PHOTO_URL_PREFIX + _name(digest, "card"),
+        "photo_thumb": PHOTO_URL_PREFIX + _name(digest, "thumb"),
+    }
+
+
+def _is_stored(digest):
+    return os.path.exists(os.path.join(PHOTO_DIR, _name(digest, "card")))
+
+
+def _write_derivatives(digest, derivatives):
+    for size, data in derivatives.items():
+        path = os.path.join(PHOTO_DIR, _name(digest, size))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write-then-rename so a reader never sees a half-written file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+# Blocking variant for scripts/migrations
+def save_photo(data):
+    digest = hashlib.sha256(data).hexdigest()
+    if not _is_stored(digest):
+        _write_derivatives(digest, make_derivatives(data))
+    return _photo_urls(digest)
+
+
+async def store_photo(data):
+    check_photo(data)
+    digest = hashlib.sha256(data).hexdigest()
+    if not await run_in_threadpool(_is_stored, digest):
+        derivatives = await run_cpu(make_derivatives, data)
+        await run_in_threadpool(_write_derivatives, digest, derivatives)
+    return _photo_urls(digest)
+
+
+# ===================== STREAMED UPLOADS =====================
+# A multipart file arrives as Starlette's SpooledTemporaryFile. It is
+# copied chunk by chunk into a named temp file while being hashed and
+# size-checked, and the worker opens that file by path: no step ever holds
+# the whole upload in memory or pickles it across the process boundary.
+
+def _spool_upload(fileobj):
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(dir=SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := fileobj.read(UPLOAD_CHUNK_SIZE):
+                if not size:
+                    check_photo(chunk, len(chunk))  # reject non-images on the first chunk
+                size += len(chunk)
+                check_size(size)
+                digest.update(chunk)
+                out.write(chunk)
+        if not size:
+            raise PhotoRejected("Photo is empty")
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest(), size
+
+
+async def store_upload(upload):
+    check_content_type(upload.content_type)
+    if upload.size is not None:
+        check_size(upload.size)
+
+    path, digest, size = await run_in_threadpool(_spool_upload, upload.file)
+    photo_upload_bytes.observe(size)
+    try:
+        if not await run_in_threadpool(_is_stored, digest):
+            derivatives = await run_cpu(make_derivatives_from_file, path)
+            await run_in_threadpool(_write_derivatives, digest, derivatives)
+    finally:
+        os.unlink(path)
+    return _photo_urls(digest)
+
+
+def load_photo_bytes(cnd):
+    path = photo_path(cnd.get("photo"))
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    # not migrated yet
+    if cnd.get("photo_base64"):
+        return base64.b64decode(cnd["photo_base64"])
+    return None
+
+
+# ===================== STATIC SERVING =====================
+
+class PhotoStaticFiles(StaticFiles):
+    # Content-addressed files never change, so browsers/CDNs may keep them
+    # forever. Range requests and ETags come from StaticFiles itself.
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if path.startswith("photos") and response.status_code in (200, 206, 304):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
@@ -0,0 +1,130 @@
+# refdata.py
+from fastapi.responses import Response
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from database import db, run_db
+
+REFDATA_TTL_SECONDS = int(os.getenv("REFDATA_TTL_SECONDS", "300"))
+
+reference_meta = db["reference_meta"]
+
+
+# ===================== REFERENCE CACHE =====================
+# Public lookup lists are served from pre-serialized bytes held in memory.
+# After the TTL a single tiny read of reference_meta tells us whether the
+# list's version moved; only then is the list itself reloaded. Bumping the
+# version (bump_version) is how edits propagate to every worker.
+
+class ReferenceCache:
+    def __init__(self, name, loader, ttl=REFDATA_TTL_SECONDS):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self._body = None
+        self._etag = None
+        self._version = None
+        self._expires = 0.0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.reloads = 0
+
+    def _current_version(self):
+        meta = reference_meta.find_one({"_id": self.name}, {"version": 1})
+        return meta["version"] if meta else 0
+
+    async def _refresh(self):
+        version = await run_db(self._current_version)
+        if self._body is not None and version == self._version:
+            self.revalidations += 1
+        else:
+            data = await run_db(self.loader)
+            self._body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self._etag = '"' + hashlib.sha256(self._body).hexdigest()[:32] + '"'
+            self._version = version
+            self.reloads += 1
+        self._expires = time.monotonic() + self.ttl
+
+    async def get(self):
+        if self._body is None or time.monotonic() >= self._expires:
+            async with self._lock:
+                # another request may have refreshed while we waited
+                if self._body is None or time.monotonic() >= self._expires:
+                    await self._refresh()
+                    return self._body, self._etag
+        self.hits += 1
+        return self._body, self._etag
+
+    def invalidate(self):
+        self._expires = 0.0
+        self._version = None
+
+    async def response(self, request):
+        body, etag = await self.get()
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={self.ttl}"}
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "revalidations": self.revalidations,
+            "reloads": self.reloads,
+            "version": self._version,
+        }
+
+
+def bump_version(name):
+    reference_meta.update_one({"_id": name}, {"$inc": {"version": 1}}, upsert=True)
+
+
+# ===================== DATASETS =====================
+
+def load_districts():
+    return [d["name"] for d in db.districts.find({}, {"_id": 0, "name": 1})]
+
+
+def load_district_secretaries():
+    return list(
+        db.district_secretaries.find({}, {"_id": 0, "name": 1, "district": 1, "photo": 1})
+        .sort("order", 1)
+    )
+
+
+DEFAULT_DISTRICT_SECRETARIES = [
+    {
+        "name": "திரு. மு. செந்தில்",
+        "district": "சென்னை",
+        "photo": "/assets/district_secretaries/dum.jpeg"
+    },
+    {
+        "name": "திரு. க. ரமேஷ்",
+        "district": "மதுரை",
+        "photo": "/assets/district_secretaries/dum.jpeg"
+    },
+    {
+        "name": "திருமதி. சு. லதா",
+        "district": "கோயம்புத்தூர்",
+        "photo": "/assets/district_secretaries/dum.jpeg"
+    }
+]
+
+
+def seed_district_secretaries():
+    if db.district_secretaries.find_one({}, {"_id": 1}):
+        return
+    db.district_secretaries.insert_many(
+        [{**s, "order": i} for i, s in enumerate(DEFAULT_DISTRICT_SECRETARIES)]
+    )
+    bump_version("district_secretaries")
+
+
+reference_caches = {
+    "districts": ReferenceCache("districts", load_districts),
+    "district_secretaries": ReferenceCache("district_secretaries", load_district_secretaries),
+}
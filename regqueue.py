@@ -0,0 +1,329 @@
+# regqueue.py
+#
+# REGISTER_MODE=buffered: write-behind registration for rally-day spikes.
+# register validates, takes a membership number from a pre-leased block,
+# appends the document to a local journal (fsync'd, one fsync per group of
+# concurrent requests) and answers 202. A background flusher moves the
+# journal into Mongo with insert_many and settles conflicts:
+#   mobile / voter ID / aadhaar already registered -> rejected
+#   already inserted (replay after a crash)        -> confirmed
+#   Mongo unreachable                              -> kept, retried
+# Clients poll /register/status/{membership_no}. Segments are deleted once
+# every entry in them is settled; on start, segments no running process
+# holds a lock on are replayed, so several workers can share the directory.
+from bson import json_util
+from collections import deque
+from datetime import datetime
+from pymongo.errors import BulkWriteError
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import fcntl
+import glob
+import logging
+import os
+import time
+
+from database import db, run_db
+from dedupe import ALREADY_REGISTERED, find_matches, is_strong, queue_matches, record_blocked, strong_match
+from sequences import allocate_membership_nos
+from stats import record_members
+
+logger = logging.getLogger(__name__)
+
+candidates_collection = db["candidates"]
+rejections_collection = db["registration_rejections"]
+
+# ===================== CONFIG =====================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTER_MODE = os.getenv("REGISTER_MODE", "direct")
+REGISTER_JOURNAL_DIR = os.getenv("REGISTER_JOURNAL_DIR", os.path.join(BASE_DIR, "journal"))
+REGISTER_QUEUE_MAX = int(os.getenv("REGISTER_QUEUE_MAX", "20000"))
+REGISTER_FLUSH_BATCH = int(os.getenv("REGISTER_FLUSH_BATCH", "500"))
+# how long the flusher waits for a batch to fill before writing it
+REGISTER_FLUSH_LINGER_MS = int(os.getenv("REGISTER_FLUSH_LINGER_MS", "100"))
+REGISTER_NUMBER_BLOCK = int(os.getenv("REGISTER_NUMBER_BLOCK", "500"))
+REGISTER_SEGMENT_ENTRIES = 10000
+RETRY_SECONDS = 2
+REJECTION_TTL_SECONDS = 7 * 24 * 3600
+
+BUFFERED = REGISTER_MODE == "buffered"
+
+
+class QueueFull(Exception):
+    pass
+
+
+# ===================== BLOCKING (run_db) =====================
+
+def _settle_duplicate(doc):
+    # insert hit a unique index: our own earlier insert, or a real clash
+    existing = candidates_collection.find_one({"membership_no": doc["membership_no"]}, {"mobile": 1})
+    if existing and existing.get("mobile") == doc["mobile"]:
+        return None
+    return "Mobile number already registered"
+
+
+# Returns (newly inserted docs, {membership_no: reason}); everything else in
+# docs is confirmed. Reasons are shown by the public /register/status, so
+# strong-key clashes only say ALREADY_REGISTERED. Raises when Mongo is unreachable so the whole batch
+# stays queued.
+def write_batch(docs):
+    rejected, reviews, seen, fresh, blocked = {}, [], {}, [], []
+    for doc, matches in zip(docs, find_matches(docs)):
+        key, member = strong_match(matches)
+        if key and member.get("membership_no") != doc["membership_no"]:
+            rejected[doc["membership_no"]] = ALREADY_REGISTERED
+            blocked.append((key, member, doc))
+            continue
+        clash = next((k for k in doc["dedupe_keys"] if is_strong(k) and k in seen), None)
+        if clash:
+            rejected[doc["membership_no"]] = ALREADY_REGISTERED
+            blocked.append((clash, {"membership_no": seen[clash]}, doc))
+            continue
+        seen.update((k, doc["membership_no"]) for k in doc["dedupe_keys"] if is_strong(k))
+        if matches and not key:
+            reviews.append((doc, matches))
+        fresh.append(doc)
+
+    inserted = fresh
+    if fresh:
+        try:
+            candidates_collection.insert_many(fresh, ordered=False)
+        except BulkWriteError as e:
+            failed = set()
+            for err in e.details["writeErrors"]:
+                doc = fresh[err["index"]]
+                reason = _settle_duplicate(doc) if err.get("code") == 11000 else err.get("errmsg", "Insert failed")
+                if reason:
+                    rejected[doc["membership_no"]] = reason
+                failed.add(err["index"])
+            inserted = [d for i, d in enumerate(fresh) if i not in failed]
+
+    now = datetime.utcnow()
+    if rejected:
+        for membership_no, reason in rejected.items():
+            rejections_collection.replace_one(
+                {"_id": membership_no}, {"reason": reason, "created_at": now}, upsert=True
+            )
+    try:
+        record_members(inserted)
+        new = {d["membership_no"] for d in inserted}
+        for doc, matches in reviews:
+            if doc["membership_no"] in new:
+                queue_matches(doc, matches)
+        for key, member, doc in blocked:
+            record_blocked(key, member, doc)
+    except Exception:
+        logger.exception("Could not update stats / review queue after buffered insert")
+    return inserted, rejected
+
+
+def registration_status(membership_no):
+    if candidates_collection.find_one({"membership_no": membership_no}, {"_id": 1}):
+        return {"status": "confirmed"}
+    rejection = rejections_collection.find_one({"_id": membership_no})
+    if rejection:
+        return {"status": "rejected", "detail": rejection["reason"]}
+    return None
+
+
+# ===================== JOURNAL =====================
+
+class Journal:
+    def __init__(self, directory):
+        self.directory = directory
+        self._file = None
+        self._path = None
+        self._entries = 0
+        self._adopted = {}
+
+    def _open_segment(self):
+        if self._file:
+            self._file.close()
+        self._path = os.path.join(self.directory, f"{time.time_ns()}-{os.getpid()}.jsonl")
+        self._file = open(self._path, "a", encoding="utf-8")
+        fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._entries = 0
+
+    # -> path of the segment the lines went to
+    def append(self, lines):
+        if self._file is None or self._entries >= REGISTER_SEGMENT_ENTRIES:
+            self._open_segment()
+        self._file.write("".join(line + "\n" for line in lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._entries += len(lines)
+        return self._path
+
+    @property
+    def current(self):
+        return self._path
+
+    # Segments of stopped processes are the unlocked ones. Adopted files
+    # stay open (and locked) until settled, so no other worker replays them.
+    def adopt_orphans(self):
+        out = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.jsonl"))):
+            f = open(path, encoding="utf-8")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                continue
+            docs = []
+            for line in f:
+                try:
+                    docs.append(json_util.loads(line))
+                except ValueError:
+                    logger.warning("Skipping torn journal line in %s", path)
+            self._adopted[path] = f
+            out.append((path, docs))
+        return out
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # replayed and removed by another worker too; harmless
+        held = self._adopted.pop(path, None)
+        if held:
+            held.close()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        for f in self._adopted.values():
+            f.close()
+
+
+# ===================== QUEUE =====================
+
+class RegistrationQueue:
+    def __init__(self, directory):
+        self.journal = Journal(directory)
+        self._pending = {}        # membership_no -> (doc, segment)
+        self._order = deque()     # membership_nos in arrival order
+        self._outstanding = {}    # segment -> unsettled entries
+        self._writes = []         # (line, doc, future) waiting for fsync
+        self._numbers = deque()
+        self._refill = None
+        self._write_wakeup = None
+        self._flush_wakeup = None
+        self._counts = {"accepted": 0, "confirmed": 0, "rejected": 0, "flush_errors": 0}
+
+    # ---------- lifecycle ----------
+    async def start(self):
+        os.makedirs(self.journal.directory, exist_ok=True)
+        self._write_wakeup = asyncio.Event()
+        self._flush_wakeup = asyncio.Event()
+        for segment, docs in await run_in_threadpool(self.journal.adopt_orphans):
+            self._outstanding[segment] = 0
+            for doc in docs:
+                self._track(doc, segment)
+            if not docs:
+                del self._outstanding[segment]
+                await run_in_threadpool(self.journal.remove, segment)
+            else:
+                logger.info("Replaying %d journaled registrations from %s", len(docs), segment)
+        self._flush_wakeup.set()
+        return [asyncio.create_task(self._write_loop()), asyncio.create_task(self._flush_loop())]
+
+    def close(self):
+        current = self.journal.current
+        self.journal.close()
+        if current and not self._outstanding.get(current):
+            os.remove(current)  # fully flushed; nothing to replay
+
+    # ---------- request path ----------
+    def full(self):
+        return len(self._pending) + len(self._writes) >= REGISTER_QUEUE_MAX
+
+    async def _fill_numbers(self):
+        self._numbers.extend(await run_db(allocate_membership_nos, REGISTER_NUMBER_BLOCK))
+
+    async def next_membership_no(self):
+        if len(self._numbers) < REGISTER_NUMBER_BLOCK // 4 and (self._refill is None or self._refill.done()):
+            self._refill = asyncio.create_task(self._fill_numbers())
+        while not self._numbers:
+            await asyncio.shield(self._refill)  # raises if Mongo is down
+            if not self._numbers:
+                self._refill = asyncio.create_task(self._fill_numbers())
+        return self._numbers.popleft()
+
+    async def submit(self, doc):
+        if self.full():
+            raise QueueFull()
+        done = asyncio.get_running_loop().create_future()
+        self._writes.append((json_util.dumps(doc, ensure_ascii=False), doc, done))
+        self._write_wakeup.set()
+        await done
+
+    def status(self, membership_no):
+        return "pending" if membership_no in self._pending else None
+
+    def stats(self):
+        return {"mode": REGISTER_MODE, "pending": len(self._pending), "segments": len(self._outstanding),
+                "membership_numbers_leased": len(self._numbers), **self._counts}
+
+    # ---------- background ----------
+    def _track(self, doc, segment):
+        if doc["membership_no"] in self._pending:
+            return
+        self._pending[doc["membership_no"]] = (doc, segment)
+        self._order.append(doc["membership_no"])
+        self._outstanding[segment] = self._outstanding.get(segment, 0) + 1
+
+    async def _write_loop(self):
+        while True:
+            await self._write_wakeup.wait()
+            self._write_wakeup.clear()
+            batch, self._writes = self._writes, []
+            if not batch:
+                continue
+            try:
+                segment = await run_in_threadpool(self.journal.append, [line for line, _, _ in batch])
+            except Exception as e:
+                logger.exception("Could not write registration journal")
+                for _, _, done in batch:
+                    done.set_exception(e)
+                continue
+            for _, doc, done in batch:
+                self._track(doc, segment)
+                self._counts["accepted"] += 1
+                done.set_result(None)
+            self._flush_wakeup.set()
+
+    async def _drop_settled_segments(self):
+        for segment, unsettled in list(self._outstanding.items()):
+            if not unsettled and segment != self.journal.current:
+                del self._outstanding[segment]
+                await run_in_threadpool(self.journal.remove, segment)
+
+    async def _flush_loop(self):
+        while True:
+            if not self._order:
+                await self._flush_wakeup.wait()
+                self._flush_wakeup.clear()
+                if len(self._order) < REGISTER_FLUSH_BATCH:
+                    await asyncio.sleep(REGISTER_FLUSH_LINGER_MS / 1000)
+            batch = [self._order[i] for i in range(min(REGISTER_FLUSH_BATCH, len(self._order)))]
+            if not batch:
+                continue
+            try:
+                _, rejected = await run_db(write_batch, [self._pending[n][0] for n in batch])
+            except Exception:
+                self._counts["flush_errors"] += 1
+                logger.exception("Buffered registration flush failed; retrying in %ss", RETRY_SECONDS)
+                await asyncio.sleep(RETRY_SECONDS)
+                continue
+            for n in batch:
+                self._order.popleft()
+                _, segment = self._pending.pop(n)
+                self._outstanding[segment] -= 1
+            await self._drop_settled_segments()
+            self._counts["confirmed"] += len(batch) - len(rejected)
+            self._counts["rejected"] += len(rejected)
+
+
+registration_queue = RegistrationQueue(REGISTER_JOURNAL_DIR)
@@ -0,0 +1,131 @@
+# search.py
+import re
+import unicodedata
+
+from database import db
+
+candidates_collection = db["candidates"]
+
+# ===================== CONFIG =====================
+SEARCH_PROJECTION = {"_id": 1, "membership_no": 1, "name": 1, "mobile": 1,
+                     "district": 1, "voter_id": 1}
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Name matches are ranked in memory; this many index hits are considered.
+NAME_RANK_WINDOW = 500
+MIN_NAME_PREFIX = 2
+MIN_NUMBER_PREFIX = 3
+
+# EPIC (voter ID card) numbers: three letters + seven digits, older
+# state-issued series two letters + more digits
+VOTER_ID = re.compile(r"^[A-Z]{2,3}[0-9]{6,10}$")
+MEMBERSHIP_NO = re.compile(r"^PBM(-[0-9]*){0,2}$")
+
+_INVISIBLE = dict.fromkeys(map(ord, "\u200b\u200c\u200d\ufeff"))
+
+
+# ===================== NAME TOKENS =====================
+# Stored on every candidate as name_tokens (multikey index), e.g.
+# "மு. முருகன்" -> ["மு", "முருகன்"], "Ánbu  SELVAM" -> ["anbu", "selvam"].
+# Accents are stripped from Latin letters only: Tamil vowel signs are
+# combining marks too and carry meaning. NFC makes the two ways of typing
+# ொ/ோ/ௌ compare equal; zero-width joiners from phone keyboards are dropped.
+
+def _is_separator(ch):
+    return ch.isspace() or unicodedata.category(ch)[0] in "PSZC"
+
+
+def normalize_name(text):
+    text = unicodedata.normalize("NFD", str(text or "").translate(_INVISIBLE))
+    out = []
+    for ch in text:
+        if unicodedata.combining(ch) and out and out[-1].isascii():
+            continue  # Latin diacritic
+        out.append(ch)
+    return unicodedata.normalize("NFC", "".join(out)).casefold()
+
+
+def name_tokens(name):
+    tokens, current = [], []
+    for ch in normalize_name(name):
+        if _is_separator(ch):
+            if current:
+                tokens.append("".join(current))
+                current = []
+        else:
+            current.append(ch)
+    if current:
+        tokens.append("".join(current))
+    return list(dict.fromkeys(tokens))
+
+
+# ===================== QUERY =====================
+# Every branch is an equality or an anchored, case-sensitive regex on an
+# indexed field, which MongoDB turns into a bounded index range scan.
+
+def _prefix(field, value):
+    return {field: {"$regex": "^" + re.escape(value)}}
+
+
+def classify(q):
+    q = " ".join(str(q or "").split())
+    digits = re.sub(r"[\s\-()+]", "", q)
+    upper = q.upper().replace(" ", "")
+
+    if digits.isdigit():
+        if len(digits) == 12 and digits.startswith("91"):
+            digits = digits[2:]
+        return ("mobile", digits) if len(digits) >= MIN_NUMBER_PREFIX else (None, None)
+    if VOTER_ID.match(upper):
+        return "voter_id", upper
+    if MEMBERSHIP_NO.match(upper):
+        return "membership_no", upper
+    tokens = name_tokens(q)
+    if not tokens or len(tokens[-1]) < MIN_NAME_PREFIX and len(tokens) == 1:
+        return None, None
+    return "name", tokens
+
+
+def _rank(doc, tokens):
+    have = name_tokens(doc.get("name"))
+    score = 0
+    for i, token in enumerate(tokens):
+        if token in have:
+            score += 2
+        elif i == len(tokens) - 1 and any(t.startswith(token) for t in have):
+            score += 1
+    if normalize_name(doc.get("name")).startswith(" ".join(tokens)):
+        score += 1
+    return (-score, len(doc.get("name") or ""), doc.get("membership_no") or "")
+
+
+# Blocking (pymongo) - call through run_db. Returns (kind, rows, next cursor).
+# Number lookups page by the field itself; ranked name results page by
+# offset inside the ranking window.
+def search_members(q, limit=DEFAULT_SEARCH_LIMIT, after="", district=""):
+    kind, value = classify(q)
+    if kind is None:
+        return None, [], None
+    base = {"district": district} if district else {}
+
+    if kind == "voter_id":
+        rows = list(candidates_collection.find({**base, "voter_id": value}, SEARCH_PROJECTION).limit(limit))
+        cursor = None
+    elif kind in ("mobile", "membership_no"):
+        query = {**base, **_prefix(kind, value)}
+        if after:
+            query[kind] = {**query[kind], "$gt": after}
+        rows = list(candidates_collection.find(query, SEARCH_PROJECTION).sort(kind, 1).limit(limit))
+        cursor = rows[-1][kind] if len(rows) == limit else None
+    else:
+        *whole, last = value
+        query = {**base, "$and": [{"name_tokens": t} for t in whole] + [_prefix("name_tokens", last)]}
+        hits = list(candidates_collection.find(query, SEARCH_PROJECTION).limit(NAME_RANK_WINDOW))
+        hits.sort(key=lambda d: _rank(d, value))
+        offset = int(after) if after.isdigit() else 0
+        rows = hits[offset:offset + limit]
+        cursor = str(offset + limit) if offset + limit < len(hits) else None
+
+    for r in rows:
+        r["_id"] = str(r["_id"])
+    return kind, rows, cursor
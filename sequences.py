@@ -0,0 +1,82 @@
+# sequences.py
+from pymongo import ReturnDocument
+from datetime import datetime
+import os
+import threading
+
+from database import db
+
+# ===================== CONFIG =====================
+# Numbers handed to each worker per round trip. With 1 the only gaps are
+# numbers burnt by rejected registrations; larger blocks also leave gaps
+# on restart in exchange for fewer round trips.
+MEMBERSHIP_BLOCK_SIZE = int(os.getenv("MEMBERSHIP_BLOCK_SIZE", "1"))
+MEMBERSHIP_PREFIX = "PBM"
+
+counters_collection = db["counters"]
+candidates_collection = db["candidates"]
+
+_lock = threading.Lock()
+_leases = {}      # counter key -> [next, last]
+_seeded = set()   # counter keys already aligned with existing data
+
+
+def format_membership_no(year, seq):
+    return f"{MEMBERSHIP_PREFIX}-{year}-{seq:06d}"
+
+
+def _counter_key(year):
+    return f"membership_no:{year}"
+
+
+def _seed_counter(key, year):
+    # First use of a year's counter: start after the highest number already
+    # issued so we never reuse one handed out by the old count-based scheme.
+    last = candidates_collection.find_one(
+        {"membership_no": {"$regex": f"^{MEMBERSHIP_PREFIX}-{year}-"}},
+        {"membership_no": 1},
+        sort=[("membership_no", -1)],
+    )
+    current = int(last["membership_no"].rsplit("-", 1)[1]) if last else 0
+    counters_collection.update_one({"_id": key}, {"$max": {"seq": current}}, upsert=True)
+    _seeded.add(key)
+
+
+def _lease(key, year, count):
+    if key not in _seeded:
+        _seed_counter(key, year)
+
+    doc = counters_collection.find_one_and_update(
+        {"_id": key},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    last = doc["seq"]
+    return last - count + 1, last
+
+
+# ===================== ALLOCATION =====================
+
+# Blocking (pymongo) - call through run_db from async code.
+def allocate_membership_nos(count=1, year=None):
+    year = year or datetime.now().year
+    key = _counter_key(year)
+    numbers = []
+
+    with _lock:
+        lease = _leases.get(key)
+        while len(numbers) < count:
+            if not lease or lease[0] > lease[1]:
+                lease = list(_lease(key, year, max(MEMBERSHIP_BLOCK_SIZE, count - len(numbers))))
+                _leases[key] = lease
+            take = min(lease[1] - lease[0] + 1, count - len(numbers))
+            numbers.extend(format_membership_no(year, n) for n in range(lease[0], lease[0] + take))
+            lease[0] += take
+
+    return numbers
+
+
+def next_membership_no(year=None):
+    return allocate_membership_nos(1, year)[0]
+
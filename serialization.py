@@ -0,0 +1,47 @@
+# serialization.py
+from bson import ObjectId
+from datetime import datetime
+from fastapi.responses import Response
+import json
+
+from streaming import compress, negotiate_encoding
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ===================== CONFIG =====================
+COMPRESS_MIN_BYTES = 1024  # below this the headers cost more than they save
+
+
+# ===================== ENCODING =====================
+# Mongo documents straight to JSON bytes. Returning a Response from a route
+# skips FastAPI's jsonable_encoder walk, which for list pages costs more
+# than the query; ObjectId (and datetime on the stdlib path) are handled
+# here, so rows need no per-row str(_id) pass either.
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+if orjson:
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default)
+else:
+    def dumps(obj):
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(request, content, status_code=200):
+    body = dumps(content)
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(request) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,60 @@
+# sessions.py
+import os
+import threading
+import time
+
+# ===================== ADMIN PRINCIPAL CACHE =====================
+# get_current_admin used to read the whole admin document on every admin
+# request. The cache is keyed on (username, token_version): change_password
+# and reset_admin_password bump token_version, so tokens issued before that
+# stop matching. A hit is still checked against Mongo with
+# ADMIN_VERSION_PROJECTION, answered from the (username, active,
+# token_version) index alone, so a bump or deactivation on any worker
+# revokes old tokens on the next request. The TTL only bounds how stale
+# the rest of the cached document (role) can get.
+
+ADMIN_CACHE_TTL_SECONDS = int(os.getenv("ADMIN_CACHE_TTL_SECONDS", "30"))
+ADMIN_VERSION_PROJECTION = {"_id": 0, "token_version": 1}
+
+
+class AdminPrincipalCache:
+    def __init__(self, ttl=ADMIN_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username, version):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry and entry[0] == version and entry[2] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, admin):
+        with self._lock:
+            self._entries[admin["username"]] = (
+                admin.get("token_version", 0), admin, time.monotonic() + self.ttl
+            )
+
+    def invalidate(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl,
+            }
+
+
+admin_cache = AdminPrincipalCache()
@@ -0,0 +1,45 @@
+# startup.py
+from contextlib import contextmanager
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Pre-render one ID card after startup so the first real request doesn't
+# pay for spawning pool workers and importing ReportLab in them.
+WARMUP_IDCARD = os.getenv("WARMUP_IDCARD", "0") == "1"
+
+
+# ===================== STARTUP REPORT =====================
+
+class StartupReport:
+    def __init__(self):
+        self.phases = []
+        self.ready = False
+        self.error = None
+
+    def record(self, name, seconds):
+        self.phases.append({"phase": name, "ms": round(seconds * 1000, 1)})
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def log(self):
+        logger.info("Startup: %s", ", ".join(f"{p['phase']}={p['ms']}ms" for p in self.phases))
+
+    def as_dict(self):
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "phases": self.phases,
+            "total_ms": round(sum(p["ms"] for p in self.phases), 1),
+        }
+
+
+startup_report = StartupReport()
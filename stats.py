@@ -0,0 +1,155 @@
+# stats.py
+from pymongo import UpdateOne
+from collections import Counter
+from datetime import datetime
+import asyncio
+import logging
+import os
+import pymongo
+
+from database import db, run_db
+
+logger = logging.getLogger(__name__)
+
+candidates_collection = db["candidates"]
+membership_stats = db["membership_stats"]
+
+# ===================== CONFIG =====================
+DIMENSIONS = ("district", "gender", "age_band", "blood_group")
+STATS_RECONCILE_SECONDS = int(os.getenv("STATS_RECONCILE_SECONDS", "3600"))
+# the recount scans the whole collection; the client's socket timeout is
+# sized for request queries, not this
+STATS_RECONCILE_TIMEOUT_SECONDS = int(os.getenv("STATS_RECONCILE_TIMEOUT_SECONDS", "600"))
+STATS_RETRY_SECONDS = 60
+
+# (label, lowest age, highest age)
+AGE_BANDS = (
+    ("<18", 0, 17),
+    ("18-25", 18, 25),
+    ("26-35", 26, 35),
+    ("36-45", 36, 45),
+    ("46-60", 46, 60),
+    ("60+", 61, 200),
+)
+UNKNOWN = "unknown"
+
+
+def age_band(age):
+    if isinstance(age, (int, float)):
+        for label, low, high in AGE_BANDS:
+            if low <= age <= high:
+                return label
+    return UNKNOWN
+
+
+# ===================== INCREMENTAL COUNTERS =====================
+# One tiny document per (dimension, value), e.g. {_id: "district:மதுரை",
+# count: 1234}. Writers bump them in one bulk round trip; readers never
+# touch the candidates collection.
+
+def _stat_keys(doc):
+    yield "total", "all"
+    for dimension in DIMENSIONS:
+        value = age_band(doc.get("age")) if dimension == "age_band" else doc.get(dimension)
+        yield dimension, value or UNKNOWN
+
+
+def _counter_op(dimension, value, inc):
+    return UpdateOne(
+        {"_id": f"{dimension}:{value}"},
+        {"$inc": {"count": inc}, "$setOnInsert": {"dimension": dimension, "value": value}},
+        upsert=True,
+    )
+
+
+def record_members(docs):
+    counts = Counter(key for doc in docs for key in _stat_keys(doc))
+    if counts:
+        membership_stats.bulk_write(
+            [_counter_op(dim, value, n) for (dim, value), n in counts.items()],
+            ordered=False,
+        )
+
+
+# ===================== RECONCILIATION =====================
+# Recount everything with one aggregation and overwrite the counters.
+# Increments that land while it runs can be off by a few until the next
+# pass, which is fine for dashboard numbers.
+
+def _age_band_expr():
+    return {"$switch": {
+        "branches": [
+            {"case": {"$and": [{"$isNumber": "$age"}, {"$gte": ["$age", low]}, {"$lte": ["$age", high]}]},
+             "then": label}
+            for label, low, high in AGE_BANDS
+        ],
+        "default": UNKNOWN,
+    }}
+
+
+def reconcile():
+    with pymongo.timeout(STATS_RECONCILE_TIMEOUT_SECONDS):
+        return _reconcile()
+
+
+def _reconcile():
+    facets = {"total": [{"$count": "count"}]}
+    for dimension in DIMENSIONS:
+        key = _age_band_expr() if dimension == "age_band" else {"$ifNull": [f"${dimension}", UNKNOWN]}
+        facets[dimension] = [{"$group": {"_id": key, "count": {"$sum": 1}}}]
+
+    result = next(candidates_collection.aggregate([{"$facet": facets}], allowDiskUse=True))
+
+    ops, seen = [], []
+    total = result["total"][0]["count"] if result["total"] else 0
+    rows = [("total", "all", total)]
+    for dimension in DIMENSIONS:
+        rows.extend((dimension, r["_id"] or UNKNOWN, r["count"]) for r in result[dimension])
+
+    for dimension, value, count in rows:
+        _id = f"{dimension}:{value}"
+        seen.append(_id)
+        ops.append(UpdateOne(
+            {"_id": _id},
+            {"$set": {"dimension": dimension, "value": value, "count": count,
+                      "reconciled_at": datetime.utcnow()}},
+            upsert=True,
+        ))
+
+    membership_stats.bulk_write(ops, ordered=False)
+    membership_stats.delete_many({"_id": {"$nin": seen}})
+    return total
+
+
+def _reconcile_if_missing():
+    if not membership_stats.find_one({"_id": "total:all"}):
+        reconcile()
+
+
+async def reconcile_periodically():
+    # first pass right away if the counters were never built, retried until
+    # it goes through (a failure here must not end the task)
+    while True:
+        try:
+            await run_db(_reconcile_if_missing)
+            break
+        except Exception:
+            logger.exception("Membership stats reconciliation failed; retrying in %ss", STATS_RETRY_SECONDS)
+            await asyncio.sleep(STATS_RETRY_SECONDS)
+
+    while STATS_RECONCILE_SECONDS > 0:
+        await asyncio.sleep(STATS_RECONCILE_SECONDS)
+        try:
+            await run_db(reconcile)
+        except Exception:
+            logger.exception("Membership stats reconciliation failed")
+
+
+# ===================== READ =====================
+
+def read_stats(dimension=None):
+    query = {"dimension": dimension} if dimension else {}
+    out = {}
+    for s in membership_stats.find(query, {"dimension": 1, "value": 1, "count": 1}):
+        out.setdefault(s["dimension"], {})[s["value"]] = s["count"]
+    return out
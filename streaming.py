@@ -0,0 +1,69 @@
+# streaming.py
+import io
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# ===================== CHUNK WRITER =====================
+# File-like sink for writers that expect a file (zipfile, csv, ...) when we
+# actually want to hand each piece to a StreamingResponse as it is produced.
+# Not seekable, so zipfile falls back to data descriptors and never needs
+# the whole archive in memory.
+
+class ChunkWriter(io.RawIOBase):
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+# ===================== GZIP =====================
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # smaller than gzip -6 on JSON at similar speed
+
+
+def accepts_gzip(request):
+    return "gzip" in request.headers.get("accept-encoding", "").lower()
+
+
+# br when the client takes it and brotli is installed, else gzip
+def negotiate_encoding(request):
+    accepted = {
+        e.split(";")[0].strip()
+        for e in request.headers.get("accept-encoding", "").lower().replace(" ", "").split(",")
+        if not e.endswith(";q=0")
+    }
+    if brotli and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return zlib.compress(body, GZIP_LEVEL, wbits=31)
+
+
+async def gzip_chunks(chunks):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    async for chunk in chunks:
+        # sync-flush per batch so the client sees rows as they are produced
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
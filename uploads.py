@@ -0,0 +1,58 @@
+# uploads.py
+from fastapi import HTTPException
+import json
+import os
+
+from imaging import MAX_PHOTO_BYTES
+
+# ===================== REQUEST BODY LIMITS =====================
+# Per-route caps on the raw request body, enforced before the multipart
+# parser runs: a declared Content-Length over the cap is refused without
+# reading a byte, and chunked bodies are cut off as soon as they cross it.
+
+FORM_OVERHEAD_BYTES = 64 * 1024  # text fields + multipart boundaries
+IMPORT_MAX_UPLOAD_BYTES = int(os.getenv("IMPORT_MAX_UPLOAD_BYTES", str(512 * 1024 * 1024)))
+
+UPLOAD_LIMITS = {
+    "/register": MAX_PHOTO_BYTES + FORM_OVERHEAD_BYTES,
+    "/admin/candidates/import": IMPORT_MAX_UPLOAD_BYTES,
+}
+
+
+def _too_large(limit):
+    return f"Upload larger than {limit // (1024 * 1024)} MB"
+
+
+class UploadLimitMiddleware:
+    def __init__(self, app, limits=UPLOAD_LIMITS):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length and length.isdigit() and int(length) > limit:
+            body = json.dumps({"detail": _too_large(limit)}).encode()
+            await send({"type": "http.response.start", "status": 413,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode()),
+                                    (b"connection", b"close")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # surfaces from request.form() as a normal 413 response
+                    raise HTTPException(status_code=413, detail=_too_large(limit))
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,31 @@
+# workers.py
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import functools
+import os
+
+# ===================== PROCESS POOL =====================
+# CPU-heavy work (image decoding, PDF rendering) runs here so it neither
+# blocks the event loop nor fights the GIL with request threads.
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", str(os.cpu_count() or 2)))
+
+_process_pool = None
+
+
+def get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS)
+    return _process_pool
+
+
+async def run_cpu(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
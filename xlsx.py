@@ -0,0 +1,144 @@
+# xlsx.py
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+from xml.sax.saxutils import escape
+
+# ===================== STREAMING XLSX WRITER =====================
+# Minimal single-sheet workbook written row by row into a zip stream, so
+# exports never hold the sheet in memory (openpyxl's write-only mode still
+# assembles the file before it can be sent). Strings are written inline,
+# which Excel/LibreOffice/Sheets all read.
+
+_ILLEGAL_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>"""
+
+_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>"""
+
+_SHEET_HEAD = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>"""
+
+_SHEET_TAIL = "</sheetData></worksheet>"
+
+
+def _cell(value):
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_ILLEGAL_XML.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class XlsxStreamWriter:
+    def __init__(self, fileobj, sheet_name="Sheet1"):
+        self._zip = zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED)
+        self._zip.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        self._zip.writestr("_rels/.rels", _ROOT_RELS)
+        self._zip.writestr("xl/workbook.xml", _WORKBOOK.format(name=escape(sheet_name)))
+        self._zip.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._sheet.write(_SHEET_HEAD.encode())
+
+    def write_rows(self, rows):
+        self._sheet.write("".join(
+            "<row>" + "".join(_cell(v) for v in row) + "</row>" for row in rows
+        ).encode("utf-8"))
+
+    def close(self):
+        self._sheet.write(_SHEET_TAIL.encode())
+        self._sheet.close()
+        self._zip.close()
+
+
+# ===================== STREAMING XLSX READER =====================
+# Yields each row of the first worksheet as a list of cell values, parsing
+# the sheet XML incrementally (iterparse) instead of loading the workbook.
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+
+def _column_index(ref):
+    col = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        col = col * 26 + (ord(ch.upper()) - 64)
+    return col - 1
+
+
+def _first_sheet_path(zf):
+    workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+    sheet = workbook.find(f"{_NS}sheets/{_NS}sheet")
+    rel_id = sheet.get(f"{_REL_NS}id")
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels:
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target").lstrip("/")
+            return target if target.startswith("xl/") else "xl/" + target
+    return "xl/worksheets/sheet1.xml"
+
+
+def _shared_strings(zf):
+    try:
+        data = zf.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    strings = []
+    for _, el in ET.iterparse(data):
+        if el.tag == f"{_NS}si":
+            strings.append("".join(t.text or "" for t in el.iter(f"{_NS}t")))
+            el.clear()
+    return strings
+
+
+def iter_xlsx_rows(fileobj):
+    with zipfile.ZipFile(fileobj) as zf:
+        strings = _shared_strings(zf)
+        with zf.open(_first_sheet_path(zf)) as sheet:
+            for _, el in ET.iterparse(sheet):
+                if el.tag != f"{_NS}row":
+                    continue
+                row = []
+                for cell in el.iter(f"{_NS}c"):
+                    ref = cell.get("r")
+                    if ref:
+                        row.extend([None] * (_column_index(ref) - len(row)))
+                    kind = cell.get("t")
+                    value = cell.find(f"{_NS}v")
+                    if kind == "inlineStr":
+                        row.append("".join(t.text or "" for t in cell.iter(f"{_NS}t")))
+                    elif value is None or value.text is None:
+                        row.append(None)
+                    elif kind == "s":
+                        row.append(strings[int(value.text)])
+                    elif kind in ("str", "e"):
+                        row.append(value.text)
+                    elif kind == "b":
+                        row.append(value.text == "1")
+                    else:
+                        number = float(value.text)
+                        row.append(int(number) if number.is_integer() else number)
+                yield row
+                el.clear()